@@ -0,0 +1,159 @@
+'''
+    File name: bench_memory.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Measures memory used by loaded instructions and by values on the data stack,
+           compared with a layout of the same objects with __dict__ and of the stack with tuples
+'''
+
+import argparse
+import os
+import sys
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import interpret_scopes as i_scopes
+import interpret_instructions as i_instr
+import interpret_types as i_types
+
+# instructions repeated in the generated program
+program_body = '''
+    <instruction order="{0}" opcode="DEFVAR"><arg1 type="var">GF@v{0}</arg1></instruction>
+    <instruction order="{1}" opcode="MOVE"><arg1 type="var">GF@v{0}</arg1><arg2 type="int">{0}</arg2></instruction>
+    <instruction order="{2}" opcode="ADD"><arg1 type="var">GF@v{0}</arg1><arg2 type="var">GF@v{0}</arg2><arg3 type="int">1</arg3></instruction>
+    <instruction order="{3}" opcode="LABEL"><arg1 type="label">l{0}</arg1></instruction>
+    <instruction order="{4}" opcode="CONCAT"><arg1 type="var">GF@s</arg1><arg2 type="string">a</arg2><arg3 type="string">b</arg3></instruction>
+    <instruction order="{5}" opcode="JUMPIFEQ"><arg1 type="label">l{0}</arg1><arg2 type="var">GF@v{0}</arg2><arg3 type="nil">nil</arg3></instruction>
+    <instruction order="{6}" opcode="CREATEFRAME"/>
+    <instruction order="{7}" opcode="WRITE"><arg1 type="var">GF@v{0}</arg1></instruction>
+'''
+
+# loop pushing one constant per iteration, GF@n holds the number of pushes
+stack_program = '''<program language="IPPcode22">
+    <instruction order="1" opcode="DEFVAR"><arg1 type="var">GF@i</arg1></instruction>
+    <instruction order="2" opcode="MOVE"><arg1 type="var">GF@i</arg1><arg2 type="int">0</arg2></instruction>
+    <instruction order="3" opcode="LABEL"><arg1 type="label">loop</arg1></instruction>
+    <instruction order="4" opcode="PUSHS"><arg1 type="string">value</arg1></instruction>
+    <instruction order="5" opcode="ADD"><arg1 type="var">GF@i</arg1><arg2 type="var">GF@i</arg2><arg3 type="int">1</arg3></instruction>
+    <instruction order="6" opcode="JUMPIFNEQ"><arg1 type="label">loop</arg1><arg2 type="var">GF@i</arg2><arg3 type="int">{0}</arg3></instruction>
+</program>
+'''
+
+def generate_program(repeat : int) -> str:
+    body = ''.join(program_body.format(*range(i * 8 + 1, i * 8 + 9)) for i in range(repeat))
+    return '<program language="IPPcode22">' + body + '</program>'
+
+def load(root, scopes):
+    """
+    Creates instructions from parsed XML, returns the first one
+    """
+    i_instr.instruction.instr_list.clear()
+    for instr in root.findall('./instruction'):
+        i = i_instr.factory.create_instruction(instr)
+    i.sort_instr_list()
+    i.resolve_labels(i.get_list())
+    i.resolve_slots(scopes)
+    return i
+
+def measure(function, *args) -> tuple:
+    """
+    Returns result of function and number of bytes allocated by it and still alive
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def slot_names(cls) -> list:
+    return [name for base in cls.__mro__ for name in base.__dict__.get('__slots__', ())]
+
+# classes with __dict__ standing for the slotted classes, one for each so they share their keys as real classes do
+dict_classes = {}
+
+def dict_copy(obj):
+    """
+    Returns copy of slotted object with its attributes in __dict__, values are shared with the original
+    """
+    cls = type(obj)
+    if cls not in dict_classes:
+        dict_classes[cls] = type(cls.__name__, (), {})
+    copy = dict_classes[cls]()
+    for name in slot_names(cls):
+        if hasattr(obj, name):
+            setattr(copy, name, getattr(obj, name))
+    return copy
+
+def slotted_copy(obj):
+    cls = type(obj)
+    copy = cls.__new__(cls)
+    for name in slot_names(cls):
+        if hasattr(obj, name):
+            setattr(copy, name, getattr(obj, name))
+    return copy
+
+def copy_instructions(i_list : list, copy) -> list:
+    """
+    Copies instructions and their arguments by given function, arguments of the copies are copies too
+    """
+    copies = []
+    for instr in i_list:
+        instr_copy = copy(instr)
+        for name in ('arg1', 'arg2', 'arg3'):
+            arg = getattr(instr, name, None)
+            if arg is not None:
+                setattr(instr_copy, name, copy(arg))
+        copies.append(instr_copy)
+    return copies
+
+def bytes_per_instruction(repeat : int) -> tuple:
+    """
+    Returns bytes per loaded instruction, bytes of objects of instructions and arguments
+    and bytes of the same objects with __dict__
+    """
+    root = ET.fromstring(generate_program(repeat))
+    scopes = i_scopes.program_scopes()
+    i, loaded = measure(load, root, scopes)
+    i_list = i.get_list()
+    # copies share values with the loaded program, so only the objects themselves are measured
+    slotted = measure(copy_instructions, i_list, slotted_copy)[1]
+    with_dict = measure(copy_instructions, i_list, dict_copy)[1]
+    return loaded / len(i_list), slotted / len(i_list), with_dict / len(i_list)
+
+def push_tuples(pushes : int) -> list:
+    stack = []
+    value_type, value = i_types.STRING, 'value'
+    for _ in range(pushes):
+        stack.append((value_type, value))
+    return stack
+
+def bytes_per_stack_value(pushes : int) -> tuple:
+    """
+    Returns bytes per value on the data stack and per value on a stack of (type, value) tuples
+    """
+    scopes = i_scopes.program_scopes()
+    i = load(ET.fromstring(stack_program.format(pushes)), scopes)
+    parallel = measure(i.run, scopes)[1]
+    tuples = measure(push_tuples, pushes)[1]
+    return parallel / pushes, tuples / pushes
+
+def print_compared(name : str, current : float, other : float, other_name : str) -> None:
+    print(f"{name:26}{current:8.1f}   {other_name}: {other:.1f} ({(current - other) / other * 100:+.1f} %)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures memory of the interpret object model')
+    parser.add_argument('--instructions', type=int, default=20000, help='number of loaded instructions')
+    parser.add_argument('--pushes', type=int, default=100000, help='number of values pushed to the data stack')
+    args = parser.parse_args()
+    loaded, slotted, with_dict = bytes_per_instruction(max(args.instructions // 8, 1))
+    print(f"{'bytes per instruction':26}{loaded:8.1f}")
+    print_compared('instruction objects', slotted, with_dict, 'with __dict__')
+    parallel, tuples = bytes_per_stack_value(args.pushes)
+    print_compared('bytes per stack value', parallel, tuples, 'with tuples')
+
+if __name__ == '__main__':
+    main()
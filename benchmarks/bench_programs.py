@@ -0,0 +1,282 @@
+'''
+    File name: bench_programs.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Benchmark of the interpret on the koule programs, benchmark programs and the test corpus
+'''
+
+import argparse
+import glob
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, root_dir)
+
+# programs measured one by one, the koule programs use the FLOAT extension which the interpret
+# does not implement, so they end with error and are reported as failed,
+# tests/koule/koule.ifj19.py is the IFJ19 source of koule_Lakoc, not an IPPcode22 program
+koule_programs = [
+    'tests/koule/pol/koule_pol.xml',
+    'tests/koule/JohnyK/koule_JohnyK.xml',
+    'tests/koule/Lakoc/koule_Lakoc.xml'
+]
+programs_dir = os.path.join(root_dir, 'benchmarks', 'programs')
+# corpora run as one program, tests/both needs the parser, tests/interpret-only has XML sources
+default_corpora = ['tests/both', 'tests/interpret-only']
+default_baseline = os.path.join(root_dir, 'benchmarks', 'baseline.json')
+
+def run_child(source : str, input_path : str, engine : str, result_path : str, count : bool) -> None:
+    """
+    Loads and runs one program in this process and writes its measurements to result_path
+    """
+    import interpret
+    import interpret_fuctions as i_func
+    import interpret_scopes as i_scopes
+    import interpret_instructions as i_instr
+    import interpret_profiler as i_profiler
+
+    result = {'exit_code' : 0, 'load_time' : None, 'run_time' : None, 'count' : None}
+    output = i_func.output_buffer(open(os.devnull, 'w'))
+    i_func.output_buffer.active = output
+    profile = None
+    with open(input_path) as input_file, open(source) as source_file:
+        scopes = i_scopes.program_scopes(i_func.input_reader(input_file), output)
+        start = time.perf_counter()
+        try:
+            i_list = i_instr.factory.load_program(source_file, scopes)
+            i_instr.factory.fuse_instructions(i_list)
+            loaded = time.perf_counter()
+            result['load_time'] = loaded - start
+            if i_list:
+                if count:
+                    profile = i_profiler.profiler(i_list)
+                interpret.run_program(engine, scopes, i_list, profile)
+        except SystemExit as e:
+            result['exit_code'] = e.code if isinstance(e.code, int) else 0
+        finally:
+            if result['load_time'] is not None:
+                result['run_time'] = time.perf_counter() - start - result['load_time']
+            output.flush()
+    if profile:
+        result['count'] = sum(profile.counts)
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(result_path, 'w') as result_file:
+        json.dump(result, result_file)
+
+def measure(source : str, input_path : str, engine : str, count : bool = False) -> dict:
+    """
+    Runs program in a new process, returns its measurements and wall time of the process
+
+    Child which ended without writing its measurements (uncaught exception, killed) gives result
+    with exit code of the process and 'error' set
+    """
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as result_file:
+        result_path = result_file.name
+    try:
+        start = time.perf_counter()
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', source, input_path, engine,
+                                result_path] + (['--count'] if count else []),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wall = time.perf_counter() - start
+        try:
+            with open(result_path) as result_file:
+                result = json.load(result_file)
+        except (OSError, ValueError):
+            result = {'exit_code' : child.returncode, 'load_time' : None, 'run_time' : None, 'count' : None,
+                        'peak_rss_kb' : None, 'error' : 'no result'}
+    finally:
+        os.unlink(result_path)
+    result['wall_time'] = wall
+    return result
+
+def to_xml(src : str, tmp_dir : str, parse_script : str):
+    """
+    Returns path to XML of test source, sources in IPPcode22 are translated by the parser
+
+    Returns None if the source needs the parser and it is not available or rejects the source
+    """
+    with open(src) as src_file:
+        head = src_file.read(64).lstrip()
+    if head.startswith('<'):
+        return src
+    php = shutil.which('php8.1') or shutil.which('php')
+    if not php or not os.path.isfile(parse_script):
+        return None
+    xml_path = os.path.join(tmp_dir, os.path.relpath(src, root_dir).replace(os.sep, '_') + '.xml')
+    with open(src) as src_file, open(xml_path, 'w') as xml_file:
+        parsed = subprocess.run([php, parse_script], stdin=src_file, stdout=xml_file, stderr=subprocess.DEVNULL)
+    if parsed.returncode != 0:
+        return None
+    return xml_path
+
+def find_tests(directory : str) -> list:
+    tests = []
+    for path, dirs, files in os.walk(directory):
+        dirs.sort()
+        tests += [os.path.join(path, f) for f in sorted(files) if f.endswith('.src')]
+    return tests
+
+def bench_program(name : str, runs : list, count : int) -> dict:
+    """
+    Returns summary of repeated runs of one program or corpus, times are medians
+
+    Program which ended with non-zero exit code or without result is failed and has no times
+    """
+    failed = [r for r in runs if r['exit_code'] != 0 or r.get('error')]
+    if failed:
+        return {'name' : name, 'exit_code' : failed[0]['exit_code'], 'failed' : True, 'error' : failed[0].get('error')}
+    summary = {
+        'name' : name,
+        'exit_code' : runs[0]['exit_code'],
+        'wall_time' : statistics.median(r['wall_time'] for r in runs),
+        'load_time' : statistics.median(r['load_time'] or 0.0 for r in runs),
+        'run_time' : statistics.median(r['run_time'] or 0.0 for r in runs),
+        'peak_rss_kb' : max(r['peak_rss_kb'] for r in runs),
+        'instructions' : count
+    }
+    summary['instr_per_sec'] = count / summary['run_time'] if count and summary['run_time'] else None
+    return summary
+
+def bench_single(source : str, empty_input : str, engine : str, repeat : int) -> dict:
+    name = os.path.relpath(source, root_dir)
+    counted = measure(source, empty_input, engine, count=True)
+    if counted['exit_code'] != 0 or counted.get('error'):
+        return bench_program(name, [counted], None)
+    runs = [measure(source, empty_input, engine) for _ in range(repeat)]
+    return bench_program(name, runs, counted['count'])
+
+def bench_corpus(directory : str, empty_input : str, engine : str, repeat : int, parse_script : str) -> dict:
+    """
+    Runs every test of corpus, the corpus is reported as one program with summed times
+    """
+    totals = []
+    count = 0
+    skipped = 0
+    broken = set()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tests = []
+        for src in find_tests(directory):
+            xml = to_xml(src, tmp_dir, parse_script)
+            if xml is None:
+                skipped += 1
+                continue
+            in_file = src[:-4] + '.in'
+            tests.append((xml, in_file if os.path.isfile(in_file) else empty_input))
+        # exit codes of tests are not checked, tests of errors end with them, only runs without result are broken
+        for xml, in_file in tests:
+            result = measure(xml, in_file, engine, count=True)
+            if result.get('error'):
+                broken.add(xml)
+            count += result['count'] or 0
+        for _ in range(repeat):
+            runs = [measure(xml, in_file, engine) for xml, in_file in tests]
+            broken |= {xml for (xml, in_file), r in zip(tests, runs) if r.get('error')}
+            runs = [r for r in runs if not r.get('error')]
+            totals.append({
+                'exit_code' : 0,
+                'wall_time' : sum(r['wall_time'] for r in runs),
+                'load_time' : sum(r['load_time'] or 0.0 for r in runs),
+                'run_time' : sum(r['run_time'] or 0.0 for r in runs),
+                'peak_rss_kb' : max((r['peak_rss_kb'] for r in runs), default=0)
+            })
+        broken = sorted(os.path.relpath(xml, root_dir) if xml.startswith(root_dir) else os.path.basename(xml)
+                        for xml in broken)
+    if not tests:
+        return None
+    summary = bench_program(os.path.relpath(directory, root_dir), totals, count)
+    summary['programs'] = len(tests)
+    summary['skipped'] = skipped
+    summary['broken'] = broken
+    return summary
+
+def print_results(results : list, baseline : dict, threshold : float) -> bool:
+    """
+    Prints results with change against baseline, returns True if some program got slower than threshold
+    """
+    regression = False
+    print(f"{'program':<40}{'rc':>4}{'wall [s]':>10}{'load [s]':>10}{'run [s]':>10}{'instr/s':>12}{'rss [MB]':>10}{'vs base':>10}")
+    for r in results:
+        if r.get('failed'):
+            reason = f"no result, rc {r['exit_code']}" if r.get('error') else f"rc {r['exit_code']}"
+            print(f"{r['name']:<40}{r['exit_code']:>4}    failed ({reason})")
+            continue
+        ips = f"{r['instr_per_sec']:.0f}" if r['instr_per_sec'] else '-'
+        change = '-'
+        base = baseline.get(r['name'])
+        if base and base.get('wall_time'):
+            ratio = r['wall_time'] / base['wall_time']
+            change = f"{(ratio - 1) * 100:+.1f}%"
+            if ratio > 1 + threshold:
+                change += ' !'
+                regression = True
+        print(f"{r['name']:<40}{r['exit_code']:>4}{r['wall_time']:>10.3f}{r['load_time']:>10.3f}{r['run_time']:>10.3f}"
+                f"{ips:>12}{r['peak_rss_kb'] / 1024:>10.1f}{change:>10}")
+        if 'skipped' in r and r['skipped']:
+            print(f"    {r['programs']} programs, {r['skipped']} skipped (parser not available or source rejected)")
+        for name in r.get('broken', []):
+            print(f"    {name}: no result, excluded from times")
+    return regression
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(*sys.argv[2:6], count='--count' in sys.argv[6:])
+        return
+    parser = argparse.ArgumentParser(description='Benchmark of the interpret on the koule programs, benchmark programs '
+                                        'and the test corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='number of measured runs of each program')
+    parser.add_argument('--engine', default='objects', help='execution engine of the interpret')
+    parser.add_argument('--corpus', action='append',
+                        help='directory with tests run as one program (default tests/both and tests/interpret-only)')
+    parser.add_argument('--no-koule', action='store_true', help='skip the koule programs')
+    parser.add_argument('--no-programs', action='store_true', help='skip the programs in benchmarks/programs')
+    parser.add_argument('--parse-script', default=os.path.join(root_dir, 'parse.php'), help='parser for IPPcode22 sources')
+    parser.add_argument('--baseline', default=default_baseline, help='file with baseline results')
+    parser.add_argument('--save-baseline', action='store_true', help='store results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown against baseline, 0.1 is 10 %%')
+    parser.add_argument('--json', help='write results to this file as JSON')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.NamedTemporaryFile(suffix='.in', delete=False) as empty:
+        empty_input = empty.name
+    try:
+        if not args.no_koule:
+            for program in koule_programs:
+                results.append(bench_single(os.path.join(root_dir, program), empty_input, args.engine, args.repeat))
+        if not args.no_programs:
+            for program in sorted(glob.glob(os.path.join(programs_dir, '*.xml'))):
+                results.append(bench_single(program, empty_input, args.engine, args.repeat))
+        for corpus in args.corpus or [os.path.join(root_dir, c) for c in default_corpora]:
+            summary = bench_corpus(os.path.abspath(corpus), empty_input, args.engine, args.repeat, args.parse_script)
+            if summary is None:
+                print(f"corpus {corpus}: no runnable tests", file=sys.stderr)
+            else:
+                results.append(summary)
+    finally:
+        os.unlink(empty_input)
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = {r['name'] : r for r in json.load(baseline_file)}
+    regression = print_results(results, baseline, args.threshold)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    if regression and not args.save_baseline:
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -6,28 +6,144 @@
     Brief: Program interprets xml source
 '''
 
-import xml.etree.ElementTree as ET
+import contextlib
+import io
+import sys
+import traceback
 
 import interpret_scopes as i_scopes
 import interpret_fuctions as i_func
 import interpret_instructions as i_instr
+# engines, cache, optimizer, profiler and trace are imported by the code which uses them,
+# so a plain run does not pay for loading them
 
 
+def run_program(engine, scopes, i_list, profile = None, trace = None):
+    """
+    Runs loaded program with given engine, under profiler if profile is given,
+    otherwise with trace of executed instructions if trace is given
+    """
+    runner = profile or trace
+    if engine == 'compiled' and not runner:
+        import interpret_compiler as i_compiler
+        i_compiler.run(scopes, i_list)
+    elif engine != 'objects':
+        import interpret_closures as i_closures
+        # blocks have no per instruction steps, compiled program is profiled and traced by closures
+        if runner:
+            runner.run(scopes, i_closures.compile_program(scopes, i_list))
+        else:
+            i_closures.run(scopes, i_list)
+    else:
+        if runner:
+            import interpret_profiler as i_profiler
+            runner.run(scopes, i_profiler.object_steps(scopes, i_list))
+        else:
+            i_list[0].run(scopes, i_list)
+
+def prepare_program(source_file, scopes, cache_dir = None, optimize = False):
+    """
+    Loads program from source or cache, optimizes it if asked and fuses instruction sequences
+
+    Returns list of instructions ready to run
+    """
+    if cache_dir:
+        import interpret_cache as i_cache
+        i_list = i_cache.load_program(source_file, scopes, cache_dir)
+    else:
+        i_list = i_instr.factory.load_program(source_file, scopes)
+    if i_list:
+        if optimize:
+            import interpret_optimizer as i_optimizer
+            i_optimizer.optimize(i_list)
+        i_instr.factory.fuse_instructions(i_list)
+    return i_list
+
+def run_captured(prepare, input_stream, engine = 'objects', trace = None, scopes = None) -> tuple:
+    """
+    Runs program in this process, returns its exit code, stdout and stderr
+
+    prepare(scopes) returns instructions ready to run, exit() of the interpret only ends the run
+    and the shared list of instructions is empty before and after the run,
+    trace is number of traced instructions as with --trace, None if tracing is off,
+    the compiled engine runs traced program by closures.
+    Scopes of an earlier run of the same program are reset and used again with code compiled for them
+    """
+    if trace:
+        import interpret_trace as i_trace
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    if scopes is None:
+        scopes = i_scopes.program_scopes(i_func.input_reader(input_stream), i_func.output_buffer(stdout))
+    else:
+        scopes.reset(input_stream, stdout)
+    output = scopes.output
+    i_func.output_buffer.active = output
+    i_instr.instruction.instr_list.clear()
+    # exit() closes sys.stdin before raising SystemExit, the host keeps its own stdin
+    host_stdin = sys.stdin
+    sys.stdin = io.StringIO()
+    rc = 0
+    try:
+        with contextlib.redirect_stderr(stderr):
+            try:
+                i_list = prepare(scopes)
+                if i_list:
+                    if trace:
+                        trace = i_trace.trace_buffer(i_list, scopes, trace)
+                        i_trace.trace_buffer.active = trace
+                    run_program(engine, scopes, i_list, trace=trace or None)
+            finally:
+                if trace:
+                    i_trace.trace_buffer.active = None
+                output.flush()
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            rc = e.code or 0
+        else:
+            print(e.code, file=stderr)
+            rc = 1
+    except Exception:
+        # uncaught exception ends python process with 1
+        traceback.print_exc(file=stderr)
+        rc = 1
+    finally:
+        sys.stdin = host_stdin
+        i_func.output_buffer.active = None
+        i_instr.instruction.instr_list.clear()
+    return rc, stdout.getvalue(), stderr.getvalue()
+
 def main():
     args = i_func.args_process()
+    if args.get_server():
+        import interpret_server as i_server
+        i_server.serve(args.get_server(), args.get_engine(), args.get_optimize(), args.get_cache_dir(),
+                        args.get_server_cache(), args.get_trace(), args.get_server_timeout())
+        return
     with args.get_input_file() as input_file, args.get_source_file() as source_file:
+        output = i_func.output_buffer(sys.stdout, line_mode=sys.stdout.isatty())
+        i_func.output_buffer.active = output
+        input = i_func.input_reader(input_file, bulk=args.has_input())
+        scopes = i_scopes.program_scopes(input, output)
+        profile = None
+        trace = None
         try:
-            myroot = ET.parse(source_file).getroot()
-        except ET.ParseError:
-            i_func.error_exit_xml_format()
-        instructions = myroot.findall("./instruction")
-        scopes = i_scopes.program_scopes()
-        for instr in instructions:            
-            i = i_instr.factory.create_instruction(instr)
-
-        if instructions:
-            i.sort_instr_list()
-            i.run(scopes, input_file)
+            i_list = prepare_program(source_file, scopes, args.get_cache_dir(), args.get_optimize())
+            if i_list:
+                if args.get_profile():
+                    import interpret_profiler as i_profiler
+                    profile = i_profiler.profiler(i_list)
+                elif args.get_trace():
+                    import interpret_trace as i_trace
+                    trace = i_trace.trace_buffer(i_list, scopes, args.get_trace())
+                    i_trace.trace_buffer.active = trace
+                run_program(args.get_engine(), scopes, i_list, profile, trace)
+        finally:
+            if trace:
+                i_trace.trace_buffer.active = None
+            output.flush()
+            if profile:
+                profile.report(args.get_profile())
             
 if __name__=="__main__":
     main()
@@ -0,0 +1,508 @@
+'''
+    File name: interpret_analysis.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Control flow graph of loaded program with reachability, frames, dominators and loops
+'''
+
+import argparse
+import io
+import json
+import sys
+
+import interpret_scopes as i_scopes
+import interpret_fuctions as i_func
+import interpret_instructions as i_instr
+import interpret_optimizer as i_optimizer
+import interpret_types as i_types
+import interpret_trace as i_trace
+
+# instructions after which the run does not continue with the next instruction
+control_opcodes = ('RETURN', 'EXIT')
+# depth of the frame stack from which deeper frame stacks are not told apart
+max_frame_depth = 16
+
+def ends_block(instr) -> bool:
+    return instr.is_branch or instr.get_opcode() in control_opcodes
+
+def unfused(i_list : list) -> list:
+    """
+    Returns list of instructions with fused instructions replaced by their first part
+    """
+    code = list(i_list)
+    for index, instr in enumerate(i_list):
+        parts = getattr(instr, 'parts', None)
+        if parts:
+            code[index] = parts[0]
+    return code
+
+def format_instr(instr) -> str:
+    """
+    Returns order, opcode and operands of instruction as written in source
+    """
+    args = []
+    for arg in instr.get_args():
+        if arg is None:
+            continue
+        if arg.get_type() in (i_types.VAR, i_types.LABEL, i_types.TYPE):
+            args.append(str(arg.get_value(instr)))
+        else:
+            args.append(i_trace.format_value(arg.get_value(instr), arg.get_type()))
+    return f"o.{instr.order} {instr.opcode} {' '.join(args)}".rstrip()
+
+def format_frames(state : tuple) -> str:
+    depth, tf = state
+    depth = f"{depth}+" if depth == max_frame_depth else str(depth)
+    return f"LF depth {depth}, TF {'exists' if tf else 'does not exist'}"
+
+def frame_step(instr, states : set) -> tuple:
+    """
+    Returns states of frames after instruction and message of frame error for states on which it fails
+
+    State is pair of depth of the frame stack and existence of TF
+    """
+    failed = set()
+    for arg in instr.get_args():
+        if arg is not None and arg.get_type() == i_types.VAR:
+            if arg.frame == 'LF':
+                failed |= {s for s in states if s[0] == 0}
+            elif arg.frame == 'TF':
+                failed |= {s for s in states if not s[1]}
+    message = f"{instr.opcode} accesses frame which does not exist"
+    opcode = instr.get_opcode()
+    if opcode == 'CREATEFRAME':
+        states = {(depth, True) for depth, tf in states}
+    elif opcode == 'PUSHFRAME':
+        failed |= {s for s in states if not s[1]}
+        message = "pushing non existent TF"
+        states = {(min(depth + 1, max_frame_depth), False) for depth, tf in states - failed}
+    elif opcode == 'POPFRAME':
+        failed |= {s for s in states if s[0] == 0}
+        message = "popping non existent LF"
+        popped = set()
+        for depth, tf in states - failed:
+            popped.add((depth - 1, True))
+            if depth == max_frame_depth:
+                popped.add((depth, True))
+        states = popped
+    else:
+        states = states - failed
+    return states, message if failed else None
+
+def var_key(arg) -> tuple:
+    """
+    Returns key of variable, LF and TF share keys because PUSHFRAME and POPFRAME move variables between them
+    """
+    return arg.frame == 'GF', arg.name
+
+def defined_vars(code : list) -> set:
+    """
+    Returns keys of variables defined by some DEFVAR of the program
+    """
+    return {var_key(instr.arg1) for instr in code if instr.get_opcode() == 'DEFVAR'}
+
+class basic_block:
+    """
+    A class to represent basic block, instructions from start to end (excluded) run one after another
+    """
+    def __init__(self, index : int, start : int, end : int):
+        self.index = index
+        self.start = start
+        self.end = end
+        # pairs of edge kind (next, jump, call, return) and index of the successor block
+        self.succs = []
+        self.preds = []
+        # program ends after the block (EXIT or end of the program)
+        self.ends = False
+        self.reachable = False
+        self.frames = set()
+        self.loop_depth = 0
+
+class loop:
+    """
+    A class to represent natural loop of a procedure
+    """
+    def __init__(self, header : int, blocks : set):
+        self.header = header
+        self.blocks = blocks
+        self.parent = None
+        self.depth = 1
+
+class procedure:
+    """
+    A class to represent the main program or code reached by CALL of a label
+
+    Blocks are reached from the entry by jumps and fall through, CALL continues after the call
+    as if the called procedure returned
+    """
+    def __init__(self, name : str, entry : int):
+        self.name = name
+        self.entry = entry
+        self.blocks = []
+        # immediate dominator of every block, None for the entry
+        self.idom = {}
+        self.loops = []
+
+    def dominates(self, a : int, b : int) -> bool:
+        while b is not None:
+            if a == b:
+                return True
+            b = self.idom.get(b)
+        return False
+
+class control_flow_graph:
+    """
+    A class to represent control flow graph of loaded program
+
+    Returns from procedures are followed only to call sites reached before, so code after CALL
+    of a procedure which never returns is not reachable.
+    Variables are checked by name only, access to a variable which no DEFVAR of the program defines
+    is an error, a variable defined elsewhere is not checked to be defined on the way to the access
+    """
+    def __init__(self, i_list : list):
+        self.code = unfused(i_list)
+        self.blocks = []
+        # index of block starting at instruction index
+        self.block_at = {}
+        self.procedures = []
+        # frame errors found by analysis, list of (instruction index, message, True if it always fails)
+        self.frame_errors = []
+        self.defined = defined_vars(self.code)
+        if self.code:
+            self.build_blocks()
+            self.find_procedures()
+            self.add_edges()
+            self.find_reachable()
+            self.track_frames()
+            for proc in self.procedures:
+                self.find_dominators(proc)
+                self.find_loops(proc)
+
+    def build_blocks(self) -> None:
+        code = self.code
+        leaders = {0}
+        for index, instr in enumerate(code):
+            if instr.get_opcode() == 'LABEL':
+                leaders.add(index)
+            if ends_block(instr) and index + 1 < len(code):
+                leaders.add(index + 1)
+        leaders = sorted(leaders) + [len(code)]
+        for start, end in zip(leaders, leaders[1:]):
+            self.block_at[start] = len(self.blocks)
+            self.blocks.append(basic_block(len(self.blocks), start, end))
+
+    def last(self, block : basic_block):
+        return self.code[block.end - 1]
+
+    def target(self, block : basic_block) -> int:
+        """
+        Returns index of block with label of branch which ends the block
+        """
+        return self.block_at[self.last(block).target + 1]
+
+    def local_succs(self, block : basic_block) -> list:
+        """
+        Returns successors in the procedure of the block, block ending with CALL continues with the next block
+        """
+        instr = self.last(block)
+        opcode = instr.get_opcode()
+        succs = []
+        if instr.is_branch and opcode != 'CALL':
+            succs.append(self.target(block))
+        if opcode not in ('JUMP', 'RETURN', 'EXIT') and block.end < len(self.code):
+            succs.append(self.block_at[block.end])
+        return succs
+
+    def find_procedures(self) -> None:
+        entries = {0 : 'main'}
+        for block in self.blocks:
+            if self.last(block).get_opcode() == 'CALL':
+                entries.setdefault(self.target(block), self.last(block).get_label_name())
+        for entry, name in entries.items():
+            proc = procedure(name, entry)
+            seen = {entry}
+            stack = [entry]
+            while stack:
+                for succ in self.local_succs(self.blocks[stack.pop()]):
+                    if succ not in seen:
+                        seen.add(succ)
+                        stack.append(succ)
+            proc.blocks = sorted(seen)
+            self.procedures.append(proc)
+        self.procedure_at = {proc.entry : proc for proc in self.procedures}
+
+    def add_edges(self) -> None:
+        # call site of every block with RETURN, as pairs of block with CALL and block after it
+        self.return_sites = {}
+        for block in self.blocks:
+            instr = self.last(block)
+            opcode = instr.get_opcode()
+            if opcode == 'CALL':
+                block.succs.append(('call', self.target(block)))
+                site = self.block_at.get(block.end)
+                for index in self.procedure_at[self.target(block)].blocks:
+                    if self.last(self.blocks[index]).get_opcode() == 'RETURN':
+                        self.return_sites.setdefault(index, []).append((block.index, site))
+            else:
+                kinds = ['jump'] if instr.is_branch else []
+                if opcode not in ('JUMP', 'RETURN', 'EXIT'):
+                    kinds.append('next')
+                block.succs += list(zip(kinds, self.local_succs(block)))
+            if opcode == 'EXIT' or (block.end == len(self.code) and opcode not in ('JUMP', 'RETURN')):
+                block.ends = True
+        for index, sites in self.return_sites.items():
+            for call, site in sites:
+                if site is None:
+                    # CALL is the last instruction, program ends after return
+                    self.blocks[index].ends = True
+                else:
+                    self.blocks[index].succs.append(('return', site))
+        for block in self.blocks:
+            for kind, succ in block.succs:
+                self.blocks[succ].preds.append((kind, block.index))
+
+    def successors(self, block : basic_block, reached) -> list:
+        """
+        Returns successors of block, return goes only to sites of calls for which reached(call) is true
+        """
+        succs = [succ for kind, succ in block.succs if kind != 'return']
+        for call, site in self.return_sites.get(block.index, ()):
+            if site is not None and reached(self.blocks[call]):
+                succs.append(site)
+        return succs
+
+    def callers(self, block : basic_block) -> list:
+        """
+        Returns blocks with RETURN from procedure called by block
+        """
+        return [index for index, sites in self.return_sites.items() if any(call == block.index for call, site in sites)]
+
+    def find_reachable(self) -> None:
+        work = [0]
+        self.blocks[0].reachable = True
+        reached = lambda b: b.reachable
+        while work:
+            block = self.blocks[work.pop()]
+            succs = self.successors(block, reached)
+            if self.last(block).get_opcode() == 'CALL':
+                # returns reached before the call go to its site now
+                succs += [s for r in self.callers(block) if self.blocks[r].reachable
+                            for s in self.successors(self.blocks[r], reached)]
+            for succ in succs:
+                if not self.blocks[succ].reachable:
+                    self.blocks[succ].reachable = True
+                    work.append(succ)
+
+    def run_frames(self, block : basic_block, record : bool = False) -> set:
+        """
+        Returns states of frames after block, frame errors are recorded if record is set
+        """
+        states = set(block.frames)
+        for index in range(block.start, block.end):
+            instr = self.code[index]
+            # instructions after one which always fails are not run
+            if record and states:
+                for arg in instr.get_args():
+                    if arg is not None and arg.get_type() == i_types.VAR and var_key(arg) not in self.defined:
+                        self.frame_errors.append((index, f"{arg.get_value(instr)} is never defined", True))
+            states, message = frame_step(instr, states)
+            if message and record:
+                self.frame_errors.append((index, message, not states))
+        return states
+
+    def track_frames(self) -> None:
+        """
+        Finds possible states of frames at start of every block
+        """
+        self.blocks[0].frames = {(0, False)}
+        reached = lambda b: bool(b.frames)
+        work = [0]
+        while work:
+            block = self.blocks[work.pop()]
+            states = self.run_frames(block)
+            succs = self.successors(block, reached)
+            if self.last(block).get_opcode() == 'CALL':
+                work += [r for r in self.callers(block) if self.blocks[r].frames]
+            for succ in succs:
+                new = states - self.blocks[succ].frames
+                if new:
+                    self.blocks[succ].frames |= new
+                    work.append(succ)
+        for block in self.blocks:
+            if block.frames:
+                self.run_frames(block, record=True)
+        self.frame_errors.sort()
+
+    def find_dominators(self, proc : procedure) -> None:
+        """
+        Finds immediate dominators in procedure (Cooper, Harvey, Kennedy)
+        """
+        # postorder by depth first search without recursion, programs can have many blocks
+        order = []
+        seen = {proc.entry}
+        stack = [(proc.entry, iter(self.local_succs(self.blocks[proc.entry])))]
+        while stack:
+            index, succs = stack[-1]
+            succ = next(succs, None)
+            if succ is None:
+                stack.pop()
+                order.append(index)
+            elif succ not in seen:
+                seen.add(succ)
+                stack.append((succ, iter(self.local_succs(self.blocks[succ]))))
+        order.reverse()
+        number = {index : n for n, index in enumerate(order)}
+        proc.preds = {index : [] for index in order}
+        for index in order:
+            for succ in self.local_succs(self.blocks[index]):
+                proc.preds[succ].append(index)
+        idom = {proc.entry : proc.entry}
+        def intersect(a, b):
+            while a != b:
+                while number[a] > number[b]:
+                    a = idom[a]
+                while number[b] > number[a]:
+                    b = idom[b]
+            return a
+        changed = True
+        while changed:
+            changed = False
+            for index in order[1:]:
+                new = None
+                for pred in proc.preds[index]:
+                    if pred in idom:
+                        new = pred if new is None else intersect(pred, new)
+                if idom.get(index) != new:
+                    idom[index] = new
+                    changed = True
+        idom[proc.entry] = None
+        proc.idom = idom
+
+    def find_loops(self, proc : procedure) -> None:
+        """
+        Finds natural loops of procedure, loops with the same header are merged
+        """
+        bodies = {}
+        for index in proc.blocks:
+            for succ in self.local_succs(self.blocks[index]):
+                if proc.dominates(succ, index):
+                    body = bodies.setdefault(succ, {succ})
+                    stack = [index]
+                    while stack:
+                        node = stack.pop()
+                        if node not in body:
+                            body.add(node)
+                            stack += proc.preds[node]
+        loops = sorted((loop(h, b) for h, b in bodies.items()), key=lambda l: len(l.blocks))
+        for n, inner in enumerate(loops):
+            for outer in loops[n + 1:]:
+                if inner.blocks < outer.blocks:
+                    inner.parent = outer
+                    break
+        for l in reversed(loops):
+            l.depth = l.parent.depth + 1 if l.parent else 1
+        for l in loops:
+            for index in l.blocks:
+                self.blocks[index].loop_depth = max(self.blocks[index].loop_depth, l.depth)
+        proc.loops = sorted(loops, key=lambda l: l.header)
+
+    def block_name(self, block : basic_block) -> str:
+        first = self.code[block.start]
+        if first.get_opcode() == 'LABEL':
+            return first.get_label_name()
+        return f"o.{first.order}"
+
+    def to_dict(self) -> dict:
+        """
+        Returns graph and results of analysis as data for JSON
+        """
+        blocks = []
+        for block in self.blocks:
+            blocks.append({
+                'id' : block.index,
+                'name' : self.block_name(block),
+                'instructions' : [format_instr(instr) for instr in self.code[block.start:block.end]],
+                'succs' : [{'kind' : kind, 'to' : succ} for kind, succ in block.succs],
+                'ends' : block.ends,
+                'reachable' : block.reachable,
+                'frames' : [format_frames(state) for state in sorted(block.frames)],
+                'loop_depth' : block.loop_depth
+            })
+        procedures = []
+        for proc in self.procedures:
+            procedures.append({
+                'name' : proc.name,
+                'entry' : proc.entry,
+                'blocks' : proc.blocks,
+                'idom' : {str(index) : dom for index, dom in sorted(proc.idom.items())},
+                'loops' : [{'header' : l.header, 'blocks' : sorted(l.blocks), 'depth' : l.depth,
+                            'parent' : l.parent.header if l.parent else None} for l in proc.loops]
+            })
+        frame_errors = [{'order' : self.code[index].order, 'message' : message, 'always' : always}
+                        for index, message, always in self.frame_errors]
+        return {'blocks' : blocks, 'procedures' : procedures, 'frame_errors' : frame_errors}
+
+    def to_dot(self) -> str:
+        """
+        Returns graph in DOT language, unreachable blocks are gray, calls and returns dashed
+        """
+        def quote(text):
+            return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        lines = ['digraph cfg {', '\tnode [shape=box, fontname="monospace"];']
+        entries = {proc.entry : proc.name for proc in self.procedures}
+        for block in self.blocks:
+            text = [f"B{block.index} {self.block_name(block)}"]
+            if block.index in entries:
+                text[0] += f" (procedure {entries[block.index]})"
+            if block.loop_depth:
+                text[0] += f" loop depth {block.loop_depth}"
+            text += [format_instr(instr) for instr in self.code[block.start:block.end]]
+            text += [format_frames(state) for state in sorted(block.frames)]
+            label = ''.join(quote(line) + '\\l' for line in text)
+            style = '' if block.reachable else ', color=gray, fontcolor=gray'
+            lines.append(f'\tB{block.index} [label="{label}"{style}];')
+        styles = {'next' : '', 'jump' : ' [color=blue]', 'call' : ' [style=dashed, label="call"]',
+                    'return' : ' [style=dashed, label="return"]'}
+        for block in self.blocks:
+            for kind, succ in block.succs:
+                lines.append(f"\tB{block.index} -> B{succ}{styles[kind]};")
+            if block.ends:
+                lines.append(f"\tB{block.index} -> end;")
+        lines.append('\tend [shape=doublecircle];')
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+def analyze(i_list : list) -> control_flow_graph:
+    """
+    Returns control flow graph of loaded program with results of analysis
+    """
+    return control_flow_graph(i_list)
+
+def main():
+    parser = argparse.ArgumentParser(description='Prints control flow graph and analysis of IPPcode22 program in XML')
+    parser.add_argument('--source', required=True, help='file with XML of source code')
+    parser.add_argument('--format', default='json', choices=('json', 'dot'), help='output format (default json)')
+    parser.add_argument('--output', help='write output to this file instead of stdout')
+    parser.add_argument('--optimize', action='store_true', help='run peephole optimizer on loaded program first')
+    args = parser.parse_args()
+
+    output = i_func.output_buffer(sys.stdout)
+    scopes = i_scopes.program_scopes(i_func.input_reader(io.StringIO()), output)
+    with open(args.source) as source_file:
+        i_list = i_instr.factory.load_program(source_file, scopes)
+    if i_list and args.optimize:
+        i_optimizer.optimize(i_list)
+    graph = analyze(i_list or [])
+    if args.format == 'dot':
+        text = graph.to_dot()
+    else:
+        text = json.dumps(graph.to_dict(), indent=2) + '\n'
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text)
+    else:
+        sys.stdout.write(text)
+
+if __name__ == '__main__':
+    main()
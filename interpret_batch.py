@@ -0,0 +1,140 @@
+'''
+    File name: interpret_batch.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Runs directory of interpret tests in one process or in a process pool
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import interpret
+import interpret_fuctions as i_func
+
+def find_tests(directory : str, recursive : bool = False) -> list:
+    """
+    Returns sorted names of tests (paths of .src files without extension) in directory
+    """
+    tests = []
+    for path, dirs, files in os.walk(directory):
+        dirs.sort()
+        tests += [os.path.join(path, f[:-4]) for f in sorted(files) if f.endswith('.src')]
+        if not recursive:
+            break
+    return tests
+
+def run_source(source_path : str, input_path : str, engine : str = 'objects', optimize : bool = False,
+                cache_dir : str = None, trace : int = None) -> tuple:
+    """
+    Runs one program in this process, returns its exit code, stdout and stderr
+    """
+    with open(input_path) as input_file, open(source_path) as source_file:
+        return interpret.run_captured(lambda scopes: interpret.prepare_program(source_file, scopes, cache_dir, optimize),
+                                        input_file, engine, trace)
+
+def read_trace(name : str):
+    """
+    Returns trace size given by --trace[=N] in .args file of test, None if the test is run without trace
+
+    Other options in the file are ignored, engine and optimization are set for the whole run
+    """
+    if not os.path.isfile(name + '.args'):
+        return None
+    trace = None
+    with open(name + '.args') as args_file:
+        for option in args_file.read().split():
+            if option == '--trace':
+                trace = 32
+            elif option.startswith('--trace='):
+                trace = int(option[len('--trace='):])
+    return trace
+
+def read_reference(name : str) -> tuple:
+    """
+    Returns expected output, exit code and stderr of test, missing files mean empty output and 0 as in test.php
+
+    Expected stderr is None when the test has no .err file, stderr is not compared then
+    """
+    ref_out = ''
+    ref_rc = 0
+    ref_err = None
+    if os.path.isfile(name + '.out'):
+        with open(name + '.out', newline='') as out_file:
+            ref_out = out_file.read()
+    if os.path.isfile(name + '.rc'):
+        with open(name + '.rc') as rc_file:
+            ref_rc = int(rc_file.read().strip() or 0)
+    if os.path.isfile(name + '.err'):
+        with open(name + '.err', newline='') as err_file:
+            ref_err = err_file.read()
+    return ref_out, ref_rc, ref_err
+
+def run_test(name : str, engine : str = 'objects', optimize : bool = False, cache_dir : str = None) -> dict:
+    """
+    Runs test and compares it with reference files
+
+    Test passes if exit code matches and, when it is 0, output matches too,
+    stderr must match the .err file if the test has one
+    """
+    input_path = name + '.in' if os.path.isfile(name + '.in') else os.devnull
+    rc, stdout, stderr = run_source(name + '.src', input_path, engine, optimize, cache_dir, read_trace(name))
+    ref_out, ref_rc, ref_err = read_reference(name)
+    passed = rc == ref_rc and (rc != 0 or stdout == ref_out) and (ref_err is None or stderr == ref_err)
+    return {'name' : name, 'passed' : passed, 'rc' : rc, 'ref_rc' : ref_rc, 'stdout' : stdout, 'stderr' : stderr}
+
+def run_test_args(args : tuple) -> dict:
+    return run_test(*args)
+
+def run_tests(tests : list, jobs : int = 1, engine : str = 'objects', optimize : bool = False,
+                cache_dir : str = None) -> list:
+    """
+    Runs tests in this process or in pool of jobs processes, results are in order of tests
+    """
+    if jobs <= 1:
+        return [run_test(name, engine, optimize, cache_dir) for name in tests]
+    work = [(name, engine, optimize, cache_dir) for name in tests]
+    with multiprocessing.Pool(jobs) as pool:
+        return pool.map(run_test_args, work, chunksize=max(1, len(work) // (jobs * 8)))
+
+def print_results(results : list, verbose : bool = False) -> None:
+    for r in results:
+        if not r['passed']:
+            reason = f"rc {r['rc']} (expected {r['ref_rc']})" if r['rc'] != r['ref_rc'] else 'output or stderr differs'
+            print(f"FAIL {r['name']}: {reason}")
+            if verbose and r['stderr']:
+                print('    ' + r['stderr'].rstrip().replace('\n', '\n    '))
+        elif verbose:
+            print(f"ok   {r['name']}")
+    passed = sum(r['passed'] for r in results)
+    print(f"passed {passed} of {len(results)}, failed {len(results) - passed}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs interpret tests (.src with XML, .in, .out, .rc) in one process')
+    parser.add_argument('--directory', default='.', help='directory with tests (default current directory)')
+    parser.add_argument('--recursive', action='store_true', help='search tests also in subdirectories')
+    parser.add_argument('--jobs', type=int, default=1, help='number of worker processes, 1 runs tests in this process')
+    parser.add_argument('--engine', default='objects', choices=i_func.engines, help='execution engine of the interpret')
+    parser.add_argument('--optimize', action='store_true', help='run peephole optimizer on loaded programs')
+    parser.add_argument('--cache', dest='cache_dir', help='directory for cache of loaded programs')
+    parser.add_argument('--verbose', action='store_true', help='list passed tests and stderr of failed ones')
+    parser.add_argument('--json', help='write results with outputs of tests to this file')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Error: directory \"{args.directory}\" does not exist", file=sys.stderr)
+        exit(41)
+    tests = find_tests(args.directory, args.recursive)
+    results = run_tests(tests, args.jobs, args.engine, args.optimize, args.cache_dir)
+    print_results(results, args.verbose)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+    if not all(r['passed'] for r in results):
+        exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+'''
+    File name: interpret_cache.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: On-disk cache of loaded programs
+'''
+
+import hashlib
+import io
+import marshal
+import os
+import sys
+import tempfile
+import zlib
+
+import interpret_scopes as i_scopes
+import interpret_instructions as i_instr
+import interpret_types as i_types
+
+# increase when the cached data or the meaning of loaded instructions changes
+CACHE_VERSION = 2
+# file header, marshal format depends on the python version
+CACHE_MAGIC = b'IPPC' + bytes([CACHE_VERSION, sys.version_info[0], sys.version_info[1]])
+
+# instruction classes by opcode
+instr_classes = {**i_instr.no_argument, **i_instr.one_argument, **i_instr.two_arguments, **i_instr.three_arguments}
+
+def cache_key(source : str) -> str:
+    """
+    Returns hash of the source text, cache version is part of the key
+    """
+    digest = hashlib.sha256(CACHE_MAGIC)
+    digest.update(source.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+def dump_program(i_list : list, scopes : i_scopes.program_scopes) -> bytes:
+    """
+    Returns loaded program in cache format
+
+    Every instruction is one flat tuple - order, opcode, jump target and type, content and slot of each argument
+
+    Types are stored by name, so the cache does not depend on values of type tags
+    """
+    instructions = []
+    for instr in i_list:
+        record = [instr.order, instr.opcode, instr.target if instr.is_branch else None]
+        for arg in instr.get_args():
+            if arg is None:
+                record += [None, None, None]
+            else:
+                content = None if arg.type == i_types.NIL else arg.content
+                record += [i_types.type_name(arg.type), content, arg.slot]
+        instructions.append(tuple(record))
+    payload = marshal.dumps((tuple(scopes.gf_scope.names), tuple(instructions)))
+    return CACHE_MAGIC + zlib.crc32(payload).to_bytes(4, 'little') + payload
+
+def restore_program(data : bytes, scopes : i_scopes.program_scopes) -> list:
+    """
+    Creates instructions from data in cache format
+
+    Returns None if the data were not created by this version of the cache or are damaged,
+    also when damaged data have valid checksum, e.g. unknown opcode or wrong number of arguments
+    """
+    header_len = len(CACHE_MAGIC) + 4
+    if not data.startswith(CACHE_MAGIC):
+        return None
+    payload = data[header_len:]
+    if zlib.crc32(payload).to_bytes(4, 'little') != data[len(CACHE_MAGIC):header_len]:
+        return None
+    try:
+        gf_names, instructions = marshal.loads(payload)
+    except (EOFError, ValueError, TypeError):
+        return None
+    # opcodes and types are checked before any instruction is created, the program is loaded from source then
+    try:
+        for record in instructions:
+            if record[1] not in instr_classes:
+                return None
+            for index in range(3, len(record), 3):
+                if record[index] is not None and not i_types.type_tag(record[index]):
+                    return None
+    except (TypeError, IndexError, KeyError):
+        return None
+    for name in gf_names:
+        scopes.gf_scope.get_slot(name)
+    argument = i_instr.argument
+    try:
+        for record in instructions:
+            arguments = []
+            for index in range(3, len(record), 3):
+                arg = None
+                if record[index] is not None:
+                    arg_type = i_types.type_tag(record[index])
+                    arg = argument(arg_type, i_types.nil if arg_type == i_types.NIL else record[index + 1])
+                    arg.slot = record[index + 2]
+                arguments.append(arg)
+            instr = instr_classes[record[1]](record[0], *arguments)
+            i_instr.instruction.instr_list.append(instr)
+            if record[2] is not None:
+                instr.target = record[2]
+    except (TypeError, IndexError):
+        # record does not fit its instruction, caller clears the instructions created so far
+        return None
+    return i_instr.instruction.instr_list
+
+def read_cache(path : str):
+    try:
+        with open(path, 'rb') as cache_file:
+            return cache_file.read()
+    except OSError:
+        return None
+
+def write_cache(path : str, data : bytes) -> None:
+    """
+    Writes cache file atomically, a failed write leaves no cache file
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+    except OSError:
+        pass
+
+def load_program(source_file, scopes : i_scopes.program_scopes, cache_dir : str) -> list:
+    """
+    Returns loaded program from cache, on a miss the program is loaded from source and cached
+    """
+    source = source_file.read()
+    path = os.path.join(cache_dir, cache_key(source) + '.ippc')
+    data = read_cache(path)
+    if data is not None:
+        i_list = restore_program(data, scopes)
+        if i_list is not None:
+            return i_list
+        # invalid cache file, start again with clean program
+        i_instr.instruction.instr_list.clear()
+        scopes.gf_scope = i_scopes.global_scope()
+    i_list = i_instr.factory.load_program(io.StringIO(source), scopes)
+    write_cache(path, dump_program(i_list, scopes))
+    return i_list
@@ -0,0 +1,578 @@
+'''
+    File name: interpret_closures.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Execution engine which compiles instructions to closures
+'''
+
+import interpret_scopes as i_scopes
+import interpret_fuctions as i_func
+import interpret_types as i_types
+
+def var_getter(instr, scopes : i_scopes.program_scopes, var_arg):
+    """
+    Returns function which finds variable given by argument
+
+    Frame and variable name are resolved here, errors are the same as in program_scopes.get_arg_var
+    """
+    name = var_arg.get_value(instr)
+    frame = var_arg.frame
+    var_name = var_arg.name
+    if var_arg.slot is not None:
+        gf = scopes.gf_scope
+        slots = gf.slots
+        slot = var_arg.slot
+        def get_var():
+            var = slots[slot]
+            if var is None:
+                return gf.get_slot_var(instr, slot)
+            return var
+    elif frame == 'LF':
+        lf_scopes = scopes.lf_scopes
+        def get_var():
+            if not lf_scopes:
+                instr.error_exit(55, "LF does not exist")
+            lf = lf_scopes[-1]
+            try:
+                return lf.var_list[var_name]
+            except KeyError:
+                return lf.get_var(instr, var_name)
+    elif frame == 'TF':
+        def get_var():
+            tf = scopes.tf_scope
+            if not tf:
+                instr.error_exit(55, "TF does not exist")
+            try:
+                return tf.var_list[var_name]
+            except KeyError:
+                return tf.get_var(instr, var_name)
+    else:
+        def get_var():
+            return scopes.get_var(instr, name)
+    return get_var
+
+def symb_getter(instr, scopes : i_scopes.program_scopes, symb):
+    """
+    Returns function which returns value and type of symb
+    """
+    if symb.get_type() != i_types.VAR:
+        const = (symb.get_value(instr), symb.get_type())
+        def get_symb():
+            return const
+        return get_symb
+    get_var = var_getter(instr, scopes, symb)
+    def get_symb():
+        var = get_var()
+        if var.initialized:
+            return var.value, var.var_type
+        return var.join_buffer(instr), var.var_type
+    return get_symb
+
+def raw_getter(instr, scopes : i_scopes.program_scopes, symb):
+    """
+    Returns function which returns value and type of symb, buffered string is returned as buffer
+    """
+    if symb.get_type() != i_types.VAR:
+        return symb_getter(instr, scopes, symb)
+    get_var = var_getter(instr, scopes, symb)
+    def get_symb():
+        var = get_var()
+        if var.initialized:
+            return var.value, var.var_type
+        return var.get_raw_value(instr), var.var_type
+    return get_symb
+
+def type_getter(instr, scopes : i_scopes.program_scopes, symb):
+    """
+    Returns function which returns type of symb without checking initialization
+    """
+    if symb.get_type() != i_types.VAR:
+        const_type = symb.get_type()
+        return lambda: const_type
+    get_var = var_getter(instr, scopes, symb)
+    return lambda: get_var().var_type
+
+# no arguments
+def build_createframe(instr, scopes):
+    return scopes.createframe
+
+def build_pushframe(instr, scopes):
+    pushframe = scopes.pushframe
+    return lambda: pushframe(instr)
+
+def build_popframe(instr, scopes):
+    popframe = scopes.popframe
+    return lambda: popframe(instr)
+
+def build_return(instr, scopes):
+    get_return_num = scopes.get_return_num
+    def run_return():
+        scopes.intr_num = get_return_num(instr) - 1
+    return run_return
+
+# one argument
+def build_defvar(instr, scopes):
+    name = instr.arg1.get_value(instr)
+    frame = instr.arg1.frame
+    var_name = instr.arg1.name
+    if instr.arg1.slot is not None:
+        define_slot = scopes.gf_scope.define_slot
+        slot = instr.arg1.slot
+        return lambda: define_slot(instr, slot)
+    elif frame == 'LF':
+        lf_scopes = scopes.lf_scopes
+        def defvar():
+            if not lf_scopes:
+                instr.error_exit(55, "LF does not exist")
+            lf_scopes[-1].define_var(instr, var_name)
+        return defvar
+    elif frame == 'TF':
+        def defvar():
+            if not scopes.tf_scope:
+                instr.error_exit(55, "TF does not exist")
+            scopes.tf_scope.define_var(instr, var_name)
+        return defvar
+    def_var = scopes.def_var
+    return lambda: def_var(instr, name)
+
+def build_pops(instr, scopes):
+    stack = scopes.stack
+    values = stack.values
+    types = stack.types
+    get_var = var_getter(instr, scopes, instr.arg1)
+    def pops():
+        top = stack.top - 1
+        if top < 0:
+            instr.error_exit(56, "popping empty stack")
+        stack.top = top
+        var = get_var()
+        var.value = values[top]
+        var.var_type = types[top]
+        values[top] = None
+        var.initialized = True
+    return pops
+
+def build_pushs(instr, scopes):
+    stack = scopes.stack
+    push = stack.push
+    if instr.arg1.get_type() != i_types.VAR:
+        const = instr.arg1.get_value(instr)
+        const_type = instr.arg1.get_type()
+        return lambda: push(const_type, const)
+    values = stack.values
+    types = stack.types
+    get_var = var_getter(instr, scopes, instr.arg1)
+    def pushs():
+        var = get_var()
+        if not var.initialized:
+            var.join_buffer(instr)
+        top = stack.top
+        if top == len(values):
+            values.append(var.value)
+            types.append(var.var_type)
+        else:
+            values[top] = var.value
+            types[top] = var.var_type
+        stack.top = top + 1
+    return pushs
+
+def build_write(instr, scopes):
+    get_symb = symb_getter(instr, scopes, instr.arg1)
+    output = scopes.output.write
+    def write():
+        value, value_type = get_symb()
+        if value_type == i_types.STRING:
+            output(value)
+        elif value_type == i_types.BOOL:
+            output('true' if value else 'false')
+        elif value_type != i_types.NIL:
+            output(str(i_func.value_for_print(value)))
+    return write
+
+def build_exit(instr, scopes):
+    get_symb = symb_getter(instr, scopes, instr.arg1)
+    def run_exit():
+        ret_val = get_symb()[0]
+        if type(ret_val) == int and ret_val >= 0 and ret_val <= 49:
+            exit(ret_val)
+        elif type(ret_val) != int:
+            instr.error_exit(53, "wrong operand type -", ret_val)
+        else:
+            instr.error_exit(57, "wrong exit code -", ret_val)
+    return run_exit
+
+def build_call(instr, scopes):
+    set_return_num = scopes.set_return_num
+    target = instr.target
+    def call():
+        set_return_num(scopes.intr_num + 1)
+        scopes.intr_num = target
+    return call
+
+def build_label(instr, scopes):
+    return lambda: None
+
+def build_jump(instr, scopes):
+    target = instr.target
+    def jump():
+        scopes.intr_num = target
+    return jump
+
+# two arguments
+def build_move(instr, scopes):
+    get_symb = symb_getter(instr, scopes, instr.arg2)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    def move():
+        value, value_type = get_symb()
+        var = get_var()
+        var.value = value
+        var.var_type = value_type
+        var.initialized = True
+    return move
+
+def build_int2char(instr, scopes):
+    get_symb = symb_getter(instr, scopes, instr.arg2)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    def int2char():
+        value, value_type = get_symb()
+        if value_type != i_types.INT:
+            instr.error_exit(53, "wrong operand types -", value)
+        try:
+            char = chr(value)
+        except ValueError:
+            instr.error_exit(58, "invalid value -", value)
+        var = get_var()
+        var.value = char
+        var.var_type = i_types.STRING
+        var.initialized = True
+    return int2char
+
+def build_strlen(instr, scopes):
+    get_symb = raw_getter(instr, scopes, instr.arg2)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    def strlen():
+        value, value_type = get_symb()
+        if value_type != i_types.STRING:
+            instr.error_exit(53, "wrong operand types -", value)
+        var = get_var()
+        var.value = len(value)
+        var.var_type = i_types.INT
+        var.initialized = True
+    return strlen
+
+def build_type(instr, scopes):
+    type_name = i_types.type_name
+    get_type = type_getter(instr, scopes, instr.arg2)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    def type_of():
+        value_type = get_type()
+        var = get_var()
+        var.value = type_name(value_type)
+        var.var_type = i_types.STRING
+        var.initialized = True
+    return type_of
+
+def build_not(instr, scopes):
+    get_symb = symb_getter(instr, scopes, instr.arg2)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    def run_not():
+        value, value_type = get_symb()
+        if value_type != i_types.BOOL:
+            instr.error_exit(53, "wrong operand types -", value)
+        var = get_var()
+        var.value = not value
+        var.var_type = i_types.BOOL
+        var.initialized = True
+    return run_not
+
+def build_read(instr, scopes):
+    readline = scopes.input.readline
+    convert = instr.convert
+    get_var = var_getter(instr, scopes, instr.arg1)
+    def read():
+        value = readline()
+        if value:
+            value, value_type = convert(value)
+        else:
+            value, value_type = i_types.nil, i_types.NIL
+        var = get_var()
+        var.value = value
+        var.var_type = value_type
+        var.initialized = True
+    return read
+
+# three arguments
+def build_arithmetic(instr, scopes):
+    get_symb1 = symb_getter(instr, scopes, instr.arg2)
+    get_symb2 = symb_getter(instr, scopes, instr.arg3)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    instr_operator = instr.instr_operator
+    def arithmetic():
+        op1, type1 = get_symb1()
+        op2, type2 = get_symb2()
+        if type1 | type2 != i_types.INT:
+            instr.error_exit(53, "wrong operand types -", op1, op2)
+        try:
+            res = int(instr_operator(op1, op2))
+        except ZeroDivisionError:
+            instr.error_exit(57, "zero devision")
+        var = get_var()
+        var.value = res
+        var.var_type = i_types.INT
+        var.initialized = True
+    return arithmetic
+
+def build_relation(instr, scopes):
+    get_symb1 = symb_getter(instr, scopes, instr.arg2)
+    get_symb2 = symb_getter(instr, scopes, instr.arg3)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    instr_operator = instr.instr_operator
+    is_eq = instr.opcode == 'EQ'
+    arg2_content = instr.arg2.get_value(instr)
+    arg3_content = instr.arg3.get_value(instr)
+    def relation():
+        op1, type1 = get_symb1()
+        op2, type2 = get_symb2()
+        if is_eq:
+            if type1 != type2 and not (type1 | type2) & i_types.NIL:
+                instr.error_exit(53, "wrong operand types -", arg2_content, arg3_content)
+        elif type1 != type2 or type1 == i_types.NIL:
+            instr.error_exit(53, "wrong operand types -", arg2_content, arg3_content)
+        try:
+            res = instr_operator(op1, op2)
+        except TypeError:
+            instr.error_exit(53, "wrong operand types -", op1, op2)
+        var = get_var()
+        var.value = res
+        var.var_type = i_types.BOOL
+        var.initialized = True
+        return res
+    return relation
+
+def build_logical(instr, scopes):
+    get_symb1 = symb_getter(instr, scopes, instr.arg2)
+    get_symb2 = symb_getter(instr, scopes, instr.arg3)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    instr_operator = instr.instr_operator
+    arg2_content = instr.arg2.get_value(instr)
+    arg3_content = instr.arg3.get_value(instr)
+    def logical():
+        op1, type1 = get_symb1()
+        op2, type2 = get_symb2()
+        if type1 | type2 != i_types.BOOL:
+            instr.error_exit(53, "wrong operand types -", arg2_content, arg3_content)
+        var = get_var()
+        var.value = instr_operator(op1, op2)
+        var.var_type = i_types.BOOL
+        var.initialized = True
+    return logical
+
+def build_stri2int(instr, scopes):
+    get_symb1 = symb_getter(instr, scopes, instr.arg2)
+    get_symb2 = symb_getter(instr, scopes, instr.arg3)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    arg2_content = instr.arg2.get_value(instr)
+    arg3_content = instr.arg3.get_value(instr)
+    def stri2int():
+        op1, type1 = get_symb1()
+        op2, type2 = get_symb2()
+        if type1 != i_types.STRING or type2 != i_types.INT:
+            instr.error_exit(53, "wrong operand types -", arg2_content, arg3_content)
+        if op2 < 0 or op2 >= len(op1):
+            instr.error_exit(58, "index out of range")
+        var = get_var()
+        var.value = ord(op1[op2])
+        var.var_type = i_types.INT
+        var.initialized = True
+    return stri2int
+
+def build_concat(instr, scopes):
+    get_symb1 = symb_getter(instr, scopes, instr.arg2)
+    get_symb2 = symb_getter(instr, scopes, instr.arg3)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    arg1_content = instr.arg1.get_value(instr)
+    arg2_content = instr.arg2.get_value(instr)
+    if instr.appends:
+        get_string = var_getter(instr, scopes, instr.arg2)
+        def append():
+            var = get_string()
+            if not var.initialized and var.buffer is None:
+                instr.error_exit(56, "variable not initialized")
+            op2, type2 = get_symb2()
+            if var.var_type | type2 != i_types.STRING:
+                instr.error_exit(53, "wrong operand types -", arg1_content, arg2_content)
+            var.get_buffer().append(op2)
+        return append
+    def concat():
+        op1, type1 = get_symb1()
+        op2, type2 = get_symb2()
+        if type1 | type2 != i_types.STRING:
+            instr.error_exit(53, "wrong operand types -", arg1_content, arg2_content)
+        var = get_var()
+        var.value = op1 + op2
+        var.var_type = i_types.STRING
+        var.initialized = True
+    return concat
+
+def build_getchar(instr, scopes):
+    get_symb1 = raw_getter(instr, scopes, instr.arg2)
+    get_symb2 = symb_getter(instr, scopes, instr.arg3)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    arg1_content = instr.arg1.get_value(instr)
+    arg2_content = instr.arg2.get_value(instr)
+    def getchar():
+        op1, type1 = get_symb1()
+        op2, type2 = get_symb2()
+        if type1 != i_types.STRING or type2 != i_types.INT:
+            instr.error_exit(53, "wrong operand types -", arg1_content, arg2_content)
+        if op2 < 0 or op2 >= len(op1):
+            instr.error_exit(58, "index out of range")
+        var = get_var()
+        var.value = op1[op2]
+        var.var_type = i_types.STRING
+        var.initialized = True
+    return getchar
+
+def build_setchar(instr, scopes):
+    get_string = raw_getter(instr, scopes, instr.arg1)
+    get_symb1 = symb_getter(instr, scopes, instr.arg2)
+    get_symb2 = symb_getter(instr, scopes, instr.arg3)
+    get_var = var_getter(instr, scopes, instr.arg1)
+    arg2_content = instr.arg2.get_value(instr)
+    arg3_content = instr.arg3.get_value(instr)
+    def setchar():
+        string, string_type = get_string()
+        op1, type1 = get_symb1()
+        op2, type2 = get_symb2()
+        if string_type | type2 != i_types.STRING or type1 != i_types.INT:
+            instr.error_exit(53, "wrong operand types -", arg2_content, arg3_content)
+        if op1 < 0 or op1 >= len(string):
+            instr.error_exit(58, "index out of range")
+        if len(op2) <= 0:
+            instr.error_exit(58, "empty string")
+        get_var().get_buffer().set_char(op1, op2[0])
+    return setchar
+
+def build_conditional_jump(instr, scopes):
+    get_symb1 = symb_getter(instr, scopes, instr.arg2)
+    get_symb2 = symb_getter(instr, scopes, instr.arg3)
+    arg2_content = instr.arg2.get_value(instr)
+    arg3_content = instr.arg3.get_value(instr)
+    target = instr.target
+    jump_if_equal = instr.opcode == 'JUMPIFEQ'
+    def conditional_jump():
+        op1, type1 = get_symb1()
+        op2, type2 = get_symb2()
+        if type1 != type2 and not (type1 | type2) & i_types.NIL:
+            instr.error_exit(53, "wrong operand types -", arg2_content, arg3_content)
+        if (op1 == op2) == jump_if_equal:
+            scopes.intr_num = target
+    return conditional_jump
+
+# fused instructions
+def build_compare_branch(instr, scopes):
+    compare = compile_instr(instr.compare, scopes)
+    target = instr.branch.target
+    jump_on = instr.jump_on
+    last = instr.last
+    def compare_branch():
+        if compare() == jump_on:
+            scopes.intr_num = target
+        else:
+            scopes.intr_num = last
+    return compare_branch
+
+def build_defvar_move(instr, scopes):
+    defvar = compile_instr(instr.parts[0], scopes)
+    move = compile_instr(instr.parts[1], scopes)
+    last = instr.last
+    def defvar_move():
+        defvar()
+        move()
+        scopes.intr_num = last
+    return defvar_move
+
+def build_frame_call(instr, scopes):
+    createframe = scopes.createframe
+    pushframe = compile_instr(instr.parts[1], scopes)
+    set_return_num = scopes.set_return_num
+    return_num = instr.last + 1
+    target = instr.parts[2].target
+    def frame_call():
+        createframe()
+        pushframe()
+        set_return_num(return_num)
+        scopes.intr_num = target
+    return frame_call
+
+# closure builders for opcodes, other instructions run their execute method
+builders = {
+    'CREATEFRAME' : build_createframe,
+    'PUSHFRAME' : build_pushframe,
+    'POPFRAME' : build_popframe,
+    'RETURN' : build_return,
+    'DEFVAR' : build_defvar,
+    'POPS' : build_pops,
+    'PUSHS' : build_pushs,
+    'WRITE' : build_write,
+    'EXIT' : build_exit,
+    'CALL' : build_call,
+    'LABEL' : build_label,
+    'JUMP' : build_jump,
+    'MOVE' : build_move,
+    'INT2CHAR' : build_int2char,
+    'STRLEN' : build_strlen,
+    'TYPE' : build_type,
+    'NOT' : build_not,
+    'READ' : build_read,
+    'ADD' : build_arithmetic,
+    'SUB' : build_arithmetic,
+    'MUL' : build_arithmetic,
+    'IDIV' : build_arithmetic,
+    'LT' : build_relation,
+    'GT' : build_relation,
+    'EQ' : build_relation,
+    'AND' : build_logical,
+    'OR' : build_logical,
+    'STRI2INT' : build_stri2int,
+    'CONCAT' : build_concat,
+    'GETCHAR' : build_getchar,
+    'SETCHAR' : build_setchar,
+    'JUMPIFEQ' : build_conditional_jump,
+    'JUMPIFNEQ' : build_conditional_jump,
+    'COMPARE+JUMPIF' : build_compare_branch,
+    'DEFVAR+MOVE' : build_defvar_move,
+    'CREATEFRAME+PUSHFRAME+CALL' : build_frame_call
+}
+
+def compile_instr(instr, scopes : i_scopes.program_scopes):
+    """
+    Returns closure executing given instruction
+    """
+    builder = builders.get(instr.get_opcode())
+    if builder:
+        return builder(instr, scopes)
+    execute = instr.execute
+    return lambda: execute(scopes)
+
+def compile_program(scopes : i_scopes.program_scopes, i_list : list) -> list:
+    """
+    Returns list of closures for all instructions
+
+    Closures are kept in scopes, a program run again with the same scopes is not compiled again
+    """
+    code = scopes.code.get('closures')
+    if code is None:
+        code = scopes.code['closures'] = [compile_instr(instr, scopes) for instr in i_list]
+    return code
+
+def run(scopes : i_scopes.program_scopes, i_list : list):
+    """
+    Compiles all instructions to closures and executes them
+    """
+    code = compile_program(scopes, i_list)
+    end = len(code)
+    while scopes.intr_num < end:
+        code[scopes.intr_num]()
+        scopes.intr_num += 1
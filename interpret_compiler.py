@@ -0,0 +1,294 @@
+'''
+    File name: interpret_compiler.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Execution engine which compiles basic blocks of the program to python functions
+'''
+
+import interpret_scopes as i_scopes
+import interpret_fuctions as i_func
+import interpret_closures as i_closures
+import interpret_types as i_types
+import interpret_analysis as i_analysis
+
+INT = i_types.INT
+BOOL = i_types.BOOL
+STRING = i_types.STRING
+NIL = i_types.NIL
+
+arithmetic_operators = {'ADD' : '+', 'SUB' : '-', 'MUL' : '*', 'IDIV' : '//'}
+relation_operators = {'LT' : '<', 'GT' : '>', 'EQ' : '=='}
+logical_operators = {'AND' : 'and', 'OR' : 'or'}
+
+class block_builder:
+    """
+    A class to generate python source of one basic block
+
+    Variables of GF are kept in locals of the block after the first use, a variable once defined
+    stays in its slot and once initialized stays initialized, so it is looked up and checked only once.
+    CONCAT and SETCHAR run by closures leave string in buffer of the variable, so it is checked again.
+    Variables of LF and TF are looked up by every instruction because frames can change.
+    Instructions without generated code are run by their closure.
+    """
+    def __init__(self, program, start : int):
+        self.program = program
+        self.start = start
+        self.lines = []
+        self.names = {}
+        self.fetched = set()
+        self.checked = set()
+        self.loop = False
+        self.indent = '    '
+
+    def bind(self, name : str, value) -> str:
+        self.names[name] = value
+        return name
+
+    def emit(self, line : str) -> None:
+        self.lines.append(self.indent + line)
+
+    def const(self, arg, index : int, number : int) -> str:
+        """
+        Returns python expression with value of constant argument
+        """
+        value = arg.content
+        if arg.type == INT or arg.type == BOOL:
+            return repr(value)
+        return self.bind(f"K{index}_{number}", value)
+
+    def error(self, instr_name : str, code : int, message : str, *args) -> str:
+        return f"{instr_name}.error_exit({code}, {message!r}{''.join(', ' + a for a in args)})"
+
+    def gf_var(self, arg, instr_name : str) -> str:
+        """
+        Returns local with variable of GF, emits its look up at the first use in the block
+        """
+        local = f"g{arg.slot}"
+        if arg.slot not in self.fetched:
+            self.emit(f"{local} = slots[{arg.slot}]")
+            self.emit(f"if {local} is None: {local} = gf_get({instr_name}, {arg.slot})")
+            self.fetched.add(arg.slot)
+        return local
+
+    def var(self, instr, arg, instr_name : str, index : int, number : int) -> str:
+        """
+        Returns local with variable of argument
+        """
+        if arg.slot is not None:
+            return self.gf_var(arg, instr_name)
+        getter = self.bind(f"V{index}_{number}", i_closures.var_getter(instr, self.program.scopes, arg))
+        local = f"v{number}"
+        self.emit(f"{local} = {getter}()")
+        return local
+
+    def read(self, instr, arg, instr_name : str, index : int, number : int) -> tuple:
+        """
+        Returns python expressions with value and type of symb, emits look up and initialization check
+        """
+        if arg.type != i_types.VAR:
+            return self.const(arg, index, number), str(arg.type)
+        local = self.var(instr, arg, instr_name, index, number)
+        if arg.slot is None or arg.slot not in self.checked:
+            self.emit(f"if not {local}.initialized: {local}.join_buffer({instr_name})")
+            if arg.slot is not None:
+                self.checked.add(arg.slot)
+        self.emit(f"a{number} = {local}.value")
+        self.emit(f"t{number} = {local}.var_type")
+        return f"a{number}", f"t{number}"
+
+    def store(self, instr, arg, instr_name : str, index : int, value : str, value_type : str) -> None:
+        local = self.var(instr, arg, instr_name, index, 1)
+        self.emit(f"{local}.value = {value}")
+        self.emit(f"{local}.var_type = {value_type}")
+        self.emit(f"{local}.initialized = True")
+
+    def contents(self, instr, index : int, *args) -> list:
+        """
+        Returns names of contents of arguments, printed in errors instead of values
+        """
+        return [self.bind(f"C{index}_{n}", arg.get_value(instr)) for n, arg in enumerate(args)]
+
+    def jump(self, target : int) -> str:
+        """
+        Returns statement which continues at instruction target
+        """
+        if target == self.start:
+            self.loop = True
+            return 'continue'
+        return f"return {target}"
+
+    def add(self, index : int, instr) -> bool:
+        """
+        Emits code of instruction, returns True if the block ends with it
+        """
+        opcode = instr.get_opcode()
+        name = self.bind(f"I{index}", instr)
+        self.emit(f"# o.{instr.order} {opcode}")
+        if opcode == 'LABEL':
+            return False
+        if opcode == 'DEFVAR' and instr.arg1.slot is not None:
+            self.emit(f"define_slot({name}, {instr.arg1.slot})")
+            self.fetched.discard(instr.arg1.slot)
+            self.checked.discard(instr.arg1.slot)
+            return False
+        if opcode == 'MOVE':
+            value, value_type = self.read(instr, instr.arg2, name, index, 2)
+            self.store(instr, instr.arg1, name, index, value, value_type)
+            return False
+        if opcode in arithmetic_operators:
+            a, ta = self.read(instr, instr.arg2, name, index, 2)
+            b, tb = self.read(instr, instr.arg3, name, index, 3)
+            if not (ta == tb == str(INT)):
+                self.emit(f"if {ta} | {tb} != {INT}: " + self.error(name, 53, "wrong operand types -", a, b))
+            if opcode == 'IDIV' and not (instr.arg3.type == INT and instr.arg3.content != 0):
+                self.emit(f"if {b} == 0: " + self.error(name, 57, "zero devision"))
+            self.store(instr, instr.arg1, name, index, f"{a} {arithmetic_operators[opcode]} {b}", str(INT))
+            return False
+        if opcode in relation_operators:
+            a, ta = self.read(instr, instr.arg2, name, index, 2)
+            b, tb = self.read(instr, instr.arg3, name, index, 3)
+            c2, c3 = self.contents(instr, index, instr.arg2, instr.arg3)
+            if opcode == 'EQ':
+                self.emit(f"if {ta} != {tb} and not ({ta} | {tb}) & {NIL}: " + self.error(name, 53, "wrong operand types -", c2, c3))
+            else:
+                self.emit(f"if {ta} != {tb} or {ta} == {NIL}: " + self.error(name, 53, "wrong operand types -", c2, c3))
+            self.store(instr, instr.arg1, name, index, f"{a} {relation_operators[opcode]} {b}", str(BOOL))
+            return False
+        if opcode in logical_operators:
+            a, ta = self.read(instr, instr.arg2, name, index, 2)
+            b, tb = self.read(instr, instr.arg3, name, index, 3)
+            c2, c3 = self.contents(instr, index, instr.arg2, instr.arg3)
+            self.emit(f"if {ta} | {tb} != {BOOL}: " + self.error(name, 53, "wrong operand types -", c2, c3))
+            self.store(instr, instr.arg1, name, index, f"({a} {logical_operators[opcode]} {b})", str(BOOL))
+            return False
+        if opcode == 'NOT':
+            a, ta = self.read(instr, instr.arg2, name, index, 2)
+            self.emit(f"if {ta} != {BOOL}: " + self.error(name, 53, "wrong operand types -", a))
+            self.store(instr, instr.arg1, name, index, f"not {a}", str(BOOL))
+            return False
+        if opcode == 'CONCAT' and not instr.appends:
+            a, ta = self.read(instr, instr.arg2, name, index, 2)
+            b, tb = self.read(instr, instr.arg3, name, index, 3)
+            c1, c2 = self.contents(instr, index, instr.arg1, instr.arg2)
+            self.emit(f"if {ta} | {tb} != {STRING}: " + self.error(name, 53, "wrong operand types -", c1, c2))
+            self.store(instr, instr.arg1, name, index, f"{a} + {b}", str(STRING))
+            return False
+        if opcode == 'WRITE':
+            if instr.arg1.type != i_types.VAR:
+                if instr.arg1.type != NIL:
+                    text = str(i_func.value_for_print(instr.arg1.content))
+                    self.emit(f"output({self.bind(f'W{index}', text)})")
+                return False
+            a, ta = self.read(instr, instr.arg1, name, index, 2)
+            self.emit(f"if {ta} == {STRING}: output({a})")
+            self.emit(f"elif {ta} == {BOOL}: output('true' if {a} else 'false')")
+            self.emit(f"elif {ta} != {NIL}: output(str({a}))")
+            return False
+        if opcode == 'PUSHS':
+            a, ta = self.read(instr, instr.arg1, name, index, 2)
+            self.emit(f"push({ta}, {a})")
+            return False
+        if opcode == 'POPS':
+            self.emit(f"t2, a2 = pop({name})")
+            self.store(instr, instr.arg1, name, index, 'a2', 't2')
+            return False
+        if opcode == 'JUMP':
+            self.emit(self.jump(instr.target + 1))
+            return True
+        if opcode in ('JUMPIFEQ', 'JUMPIFNEQ'):
+            a, ta = self.read(instr, instr.arg2, name, index, 2)
+            b, tb = self.read(instr, instr.arg3, name, index, 3)
+            c2, c3 = self.contents(instr, index, instr.arg2, instr.arg3)
+            self.emit(f"if {ta} != {tb} and not ({ta} | {tb}) & {NIL}: " + self.error(name, 53, "wrong operand types -", c2, c3))
+            relation = '==' if opcode == 'JUMPIFEQ' else '!='
+            self.emit(f"if {a} {relation} {b}: " + self.jump(instr.target + 1))
+            self.emit(f"return {index + 1}")
+            return True
+        # instruction runs by its closure, which may read the instruction number
+        step = self.bind(f"F{index}", i_closures.compile_instr(instr, self.program.scopes))
+        self.emit(f"scopes.intr_num = {index}")
+        self.emit(f"{step}()")
+        if opcode in ('CONCAT', 'SETCHAR') and instr.arg1.slot is not None:
+            self.checked.discard(instr.arg1.slot)
+        if i_analysis.ends_block(instr):
+            self.emit("return scopes.intr_num + 1")
+            return True
+        return False
+
+    def build(self):
+        """
+        Generates source of the block and returns compiled function
+        """
+        program = self.program
+        index = self.start
+        while index < program.end:
+            ended = self.add(index, program.code[index])
+            index += 1
+            if ended or index in program.leaders:
+                break
+        if not self.lines or not self.lines[-1].strip().startswith('return'):
+            self.emit(f"return {index}")
+        body = self.lines
+        if self.loop:
+            body = ['    while True:'] + ['    ' + line for line in body]
+        names = dict(program.names, **self.names)
+        params = ', '.join(f"{n}={n}" for n in names)
+        source = f"def block({params}):\n" + '\n'.join(body) + '\n'
+        program.sources[self.start] = source
+        namespace = dict(names)
+        exec(compile(source, f"<block o.{program.code[self.start].order}>", 'exec'), namespace)
+        return namespace['block']
+
+class compiled_program:
+    """
+    A class to represent program compiled to python functions by basic blocks
+
+    Block starts at a label, after a jump, call, return or exit and wherever the run continues from a block
+    which was not compiled yet. Blocks are compiled when the run reaches them, a block returns index of the
+    next instruction and the trampoline in run calls the block starting there. Block which jumps to its own
+    start loops inside of its function.
+    """
+    def __init__(self, scopes : i_scopes.program_scopes, i_list : list):
+        self.scopes = scopes
+        self.code = i_analysis.unfused(i_list)
+        self.end = len(self.code)
+        self.leaders = {index for index, instr in enumerate(self.code) if instr.get_opcode() == 'LABEL'}
+        self.leaders |= {index + 1 for index, instr in enumerate(self.code) if i_analysis.ends_block(instr)}
+        self.blocks = [None] * self.end
+        self.sources = {}
+        stack = scopes.stack
+        self.names = {
+            'scopes' : scopes,
+            'slots' : scopes.gf_scope.slots,
+            'gf_get' : scopes.gf_scope.get_slot_var,
+            'define_slot' : scopes.gf_scope.define_slot,
+            'output' : scopes.output.write,
+            'push' : stack.push,
+            'pop' : stack.pop
+        }
+
+    def run(self) -> None:
+        """
+        Runs blocks until the run leaves the program
+        """
+        blocks = self.blocks
+        end = self.end
+        pc = self.scopes.intr_num
+        while pc < end:
+            block = blocks[pc]
+            if block is None:
+                block = blocks[pc] = block_builder(self, pc).build()
+            pc = block()
+        self.scopes.intr_num = pc
+
+def run(scopes : i_scopes.program_scopes, i_list : list) -> None:
+    """
+    Compiles program by basic blocks and executes it
+
+    Compiled program is kept in scopes, blocks compiled in a run are reused when the scopes run it again
+    """
+    program = scopes.code.get('compiled')
+    if program is None:
+        program = scopes.code['compiled'] = compiled_program(scopes, i_list)
+    program.run()
@@ -10,6 +10,96 @@ import os
 import sys
 import re
 
+import interpret_types as i_types
+
+# execution engines selectable by --engine
+engines = ('objects', 'closures', 'compiled')
+
+class output_buffer:
+    """
+    A class to collect program output before it is written to the output stream
+
+    Buffer is written out when it reaches its size limit, at the end of each line in line mode,
+    before any message on stderr and when the program ends
+    """
+    # buffer of the running program, flushed by error messages
+    active = None
+
+    def __init__(self, stream, limit : int = 65536, line_mode : bool = False):
+        self.stream = stream
+        self.limit = limit
+        self.line_mode = line_mode
+        self.parts = []
+        self.size = 0
+
+    def reset(self, stream) -> None:
+        """
+        Drops unwritten output and writes to stream from now on
+        """
+        self.stream = stream
+        self.parts.clear()
+        self.size = 0
+
+    def write(self, text : str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.limit or (self.line_mode and '\n' in text):
+            self.flush()
+
+    def flush(self) -> None:
+        if self.parts:
+            self.stream.write(''.join(self.parts))
+            self.parts.clear()
+            self.size = 0
+        self.stream.flush()
+
+    @classmethod
+    def flush_active(cls) -> None:
+        """
+        Writes out output of the running program, called before writing to stderr
+        """
+        if cls.active:
+            cls.active.flush()
+
+class input_reader:
+    """
+    A class to read input lines for READ
+
+    In bulk mode the whole stream is read at the first READ and lines are handed out by index,
+    otherwise the stream is read line by line
+    """
+    def __init__(self, stream, bulk : bool = True):
+        self.stream = stream
+        self.bulk = bulk
+        self.lines = None
+        self.index = 0
+
+    def reset(self, stream) -> None:
+        """
+        Reads stream from its start from now on
+        """
+        self.stream = stream
+        self.lines = None
+        self.index = 0
+
+    def readline(self) -> str:
+        """
+        Returns next line without newline, empty string at the end of input
+        """
+        if not self.bulk:
+            line = self.stream.readline()
+            if line and line[-1] == '\n':
+                line = line[:-1]
+            return line
+        if self.lines is None:
+            # newlines are already translated by the text stream, same as for readline
+            self.lines = self.stream.read().split('\n')
+        if self.index < len(self.lines):
+            line = self.lines[self.index]
+            self.index += 1
+            return line
+        return ''
+
 class program_arguments:
     """
     A class to encapsulate program arguments
@@ -20,6 +110,14 @@ class program_arguments:
         self.has_input_file = False
         self.source_file = '-'
         self.input_file = '-'     
+        self.engine = 'objects'
+        self.cache_dir = None
+        self.profile = None
+        self.optimize = False
+        self.server = None
+        self.trace = None
+        self.server_cache = 128
+        self.server_timeout = 10
 
     def process_args(self):
         """
@@ -49,17 +147,118 @@ class program_arguments:
                 file_validity(input, 'input')                   
                 self.has_input_file = True
                 self.input_file = input
+            # --engine=ENGINE
+            engine = re.search(r"(?<=--engine=)\S+", arg)
+            if engine:
+                engine = engine.group()
+                if engine not in engines:
+                    print(f"Error: unknown engine \"{engine}\", use one of: {', '.join(engines)}", file=sys.stderr)
+                    exit(10)
+                self.engine = engine
+            # --profile, --profile=FILE
+            if arg == '--profile':
+                self.profile = '-'
+            profile = re.search(r"(?<=--profile=)\S+", arg)
+            if profile:
+                self.profile = profile.group()
+            # --trace, --trace=N
+            if arg == '--trace':
+                self.trace = 32
+            trace = re.search(r"(?<=--trace=)\S+", arg)
+            if trace:
+                if not trace.group().isdigit() or int(trace.group()) < 1:
+                    print(f"Error: invalid trace size \"{trace.group()}\"", file=sys.stderr)
+                    exit(10)
+                self.trace = int(trace.group())
+            # --optimize
+            if arg == '--optimize':
+                self.optimize = True
+            # --cache=DIR
+            cache_dir = re.search(r"(?<=--cache=)\S+", arg)
+            if cache_dir:
+                self.cache_dir = cache_dir.group()
+            # --server=SOCKET
+            server = re.search(r"(?<=--server=)\S+", arg)
+            if server:
+                self.server = server.group()
+            # --server-cache=N
+            server_cache = re.search(r"(?<=--server-cache=)\S+", arg)
+            if server_cache:
+                if not server_cache.group().isdigit() or int(server_cache.group()) < 1:
+                    print(f"Error: invalid number of cached programs \"{server_cache.group()}\"", file=sys.stderr)
+                    exit(10)
+                self.server_cache = int(server_cache.group())
+            # --server-timeout=SECONDS
+            server_timeout = re.search(r"(?<=--server-timeout=)\S+", arg)
+            if server_timeout:
+                if not server_timeout.group().isdigit():
+                    print(f"Error: invalid time limit \"{server_timeout.group()}\"", file=sys.stderr)
+                    exit(10)
+                self.server_timeout = int(server_timeout.group())
 
         if self.will_print_help:
             print_help()
             exit(0)
 
-        missing_both_files = (not self.has_input_file) and (not self.has_source_file)
+        # blocks of the compiled engine have no per instruction steps to trace
+        if self.trace and self.engine == 'compiled':
+            print("Error: --trace cannot be combined with --engine=compiled, use objects or closures", file=sys.stderr)
+            exit(10)
+
+        missing_both_files = (not self.has_input_file) and (not self.has_source_file) and not self.server
         if missing_both_files:
             print_help()
             print("\nError: one of the arguments --source --input is required", file=sys.stderr)
             exit(10)
 
+    def get_engine(self):
+        """
+        Returns name of the selected execution engine
+        """
+        return self.engine
+
+    def get_cache_dir(self):
+        """
+        Returns directory for cached programs or None if caching is off
+        """
+        return self.cache_dir
+
+    def get_profile(self):
+        """
+        Returns destination of profile, '-' for stderr, None if profiling is off
+        """
+        return self.profile
+
+    def get_trace(self):
+        """
+        Returns number of traced instructions, None if tracing is off
+        """
+        return self.trace
+
+    def get_optimize(self) -> bool:
+        """
+        Returns True if loaded program is optimized before run
+        """
+        return self.optimize
+
+    def get_server(self):
+        """
+        Returns path of socket of the server, None if the interpret runs one program
+        """
+        return self.server
+
+    def get_server_cache(self) -> int:
+        """
+        Returns number of loaded programs kept by the server
+        """
+        return self.server_cache
+
+    def get_server_timeout(self) -> int:
+        """
+        Returns time limit of one run in the server in seconds, 0 means no limit
+        """
+        return self.server_timeout
+
     def get_source_file(self):
         """
         Returns open file or stdin
@@ -70,6 +269,12 @@ class program_arguments:
             file = sys.stdin
         return file
 
+    def has_input(self) -> bool:
+        """
+        Returns True if input is read from file given by --input
+        """
+        return self.has_input_file
+
     def get_input_file(self):
         """
         Returns open file or stdin
@@ -96,11 +301,26 @@ def print_help():
     """
     Prints help message
     """
-    print("usage: interpret.py [-h] (--source SOURCE | --input INPUT)\n\n"
+    print("usage: interpret.py [-h] (--source SOURCE | --input INPUT) [--engine ENGINE] [--cache DIR] [--profile[=FILE]]\n"
+            "                    [--optimize] [--trace[=N]]\n"
+            "       interpret.py --server SOCKET [--server-cache N] [--server-timeout S] [--engine ENGINE] [--cache DIR]\n"
+            "                    [--optimize] [--trace[=N]]\n\n"
             "optional arguments:\n"
             "  -h, --help       show this help message and exit\n"
             "  --source SOURCE  source file with XML of source code\n"
-            "  --input INPUT    file with input for interpret", file=sys.stderr)
+            "  --input INPUT    file with input for interpret\n"
+            "  --engine ENGINE  execution engine - objects (default), closures or compiled (basic blocks\n"
+            "                   compiled to python functions)\n"
+            "  --cache DIR      directory for cache of loaded programs\n"
+            "  --optimize       run peephole optimizer on loaded program\n"
+            "  --profile[=FILE] write execution count and time of instructions to stderr or FILE\n"
+            "                   (JSON if FILE ends with .json)\n"
+            "  --trace[=N]      keep last N (default 32) executed instructions, BREAK and runtime errors\n"
+            "                   print them with frames and data stack, not with the compiled engine\n"
+            "  --server SOCKET  serve requests to run programs on Unix socket\n"
+            "  --server-cache N number of loaded programs kept by the server (default 128)\n"
+            "  --server-timeout S\n"
+            "                   time limit of one run in the server in seconds (default 10, 0 is no limit)", file=sys.stderr)
 
 def error_exit_xml_format():
     print("Error: invalid XML format", file=sys.stderr)
@@ -139,26 +359,25 @@ def str_escape(string : str):
     """
     return re.sub(r'\\\d{3}', convert_to_char, string)
 
-def get_symb_value(instr, scopes, symb):
+def get_symb(instr, scopes, symb) -> tuple:
     """
-    Returns value of symb
+    Returns value and type of symb, variable is looked up only once
     """
-    if symb.get_type() == 'var':
-        val = scopes.get_var(instr, symb.get_value(instr)).get_value(instr)
-    else:
-        val = symb.get_value(instr)
-    return val
+    if symb.type == i_types.VAR:
+        var = scopes.get_arg_var(instr, symb)
+        if var.initialized:
+            return var.value, var.var_type
+        return var.join_buffer(instr), var.var_type
+    return symb.content, symb.type
 
-def get_symb_type(instr, scopes, symb):
+def get_symb_raw(instr, scopes, symb) -> tuple:
     """
-    Returns type of symb
+    Returns value and type of symb, buffered string is returned as buffer for measuring and indexing
     """
-    if symb.get_type() == 'var':
-        get_symb_value(instr, scopes, symb)
-        val_type = scopes.get_var(instr, symb.get_value(instr)).get_type()
-    else:
-        val_type = symb.get_type()
-    return val_type
+    if symb.type == i_types.VAR:
+        var = scopes.get_arg_var(instr, symb)
+        return var.get_raw_value(instr), var.var_type
+    return symb.content, symb.type
 
 def get_symb_type_no_err(instr, scopes, symb):
     """
@@ -166,8 +385,8 @@ def get_symb_type_no_err(instr, scopes, symb):
 
     Returns type of symb    
     """
-    if symb.get_type() == 'var':
-        val_type = scopes.get_var(instr, symb.get_value(instr)).get_type()
+    if symb.get_type() == i_types.VAR:
+        val_type = scopes.get_arg_var(instr, symb).get_type()
     else:
         val_type = symb.get_type()
     return val_type
@@ -8,37 +8,62 @@
 
 import operator
 import sys
+import xml.etree.ElementTree as ET
 
 import interpret_scopes as i_scopes
 import interpret_fuctions as i_func
+import interpret_types as i_types
+import interpret_trace as i_trace
 
 class argument:
     """
     A class to represent instruction arguments
     """
-    def __init__(self, type : str, content):
+    __slots__ = ('type', 'content', 'slot', 'frame', 'name')
+    def __init__(self, type : int, content):
+        # tag from interpret_types
         self.type = type
         self.content = content
+        # global frame slot of GF variable
+        self.slot = None
+        # frame and name of variable are split once, runtime does not slice the content
+        self.frame = None
+        self.name = None
+        if type == i_types.VAR and content:
+            self.frame = sys.intern(content[:2])
+            self.name = content[3:]
 
     def get_value(self, instr):
-        value = self.content
-        if self.type == 'string':
-            value = i_func.str_escape(self.content)
-        return value
+        return self.content
 
     def get_type(self):
         return self.type
 
-class instruction:
+class slotted_instr(type):
+    """
+    Metaclass which gives every instruction class empty __slots__ unless it defines its own
+
+    Instructions then have no __dict__, attributes are only the slots of their base classes
+    """
+    def __new__(mcs, name, bases, namespace):
+        namespace.setdefault('__slots__', ())
+        return super().__new__(mcs, name, bases, namespace)
+
+class instruction(metaclass=slotted_instr):
     """
     A class to represent instruction instructions
     """
-    # shared list of all instructions
+    __slots__ = ('order',)
+    # shared list of instructions loaded by factory, instructions created later are not added
     instr_list = []
-    def __init__(self, order : int, opcode : str = None):
+    # index of the instruction class in dispatch_table, set by register_opcodes
+    opcode_id = None
+    # instructions jumping to label in arg1
+    is_branch = False
+    # opcode name, set by every instruction class
+    opcode = None
+    def __init__(self, order : int):
         self.order = int(order)
-        self.opcode = opcode
-        self.instr_list.append(self)
 
     def execute(self, scopes :  i_scopes.program_scopes):
         """
@@ -52,28 +77,32 @@ class instruction:
         """
         Prints error to stderr and exits with given error code
         """
+        i_func.output_buffer.flush_active()
         print(f"Error: instruction o.{self.order} {self.opcode}: {error_message}", end='', file=sys.stderr)
         for a in args:
             a = i_func.value_for_print(a)
             print('', a, end='', file=sys.stderr)
         print(file=sys.stderr)
+        i_trace.trace_buffer.dump_active()
         exit(error_code)
     
     @classmethod
-    def run(cls, scopes :  i_scopes.program_scopes, input_file):
+    def run(cls, scopes :  i_scopes.program_scopes, i_list : list = None):
         """
-        Executes all instructions one by one
+        Executes all instructions one by one, the shared list of instructions if i_list is not given
+
+        Instructions are dispatched by their opcode id through dispatch_table,
+        jumps change the instruction number stored in scopes
         """
-        try:
-            i = cls.instr_list[scopes.get_instr_num()]
-        except IndexError:
-            return
-        if i.get_opcode() == 'READ':
-            i.execute(scopes, input_file)
-        else:
-            i.execute(scopes)
-        scopes.inc_instr_num()
-        cls.run(scopes, input_file)  
+        if i_list is None:
+            i_list = cls.instr_list
+        ops = [i.opcode_id for i in i_list]
+        table = dispatch_table
+        end = len(i_list)
+        while scopes.intr_num < end:
+            num = scopes.intr_num
+            table[ops[num]](i_list[num], scopes)
+            scopes.intr_num += 1
     
     def sort_instr_list(self):
         """
@@ -86,19 +115,42 @@ class instruction:
                 if i.get_order() == i_list[index+1].get_order():
                     self.error_exit(32, "order duplicate")
 
-    def find_label(self, label : str):
+    def resolve_labels(self, i_list : list):
         """
-        Return index of given label
+        Finds index of every label in i_list and stores it in instructions which jump to it
+
+        Duplicate and undefined labels are reported before the program runs
         """
-        i_list = self.get_list()
+        labels = {}
         for index, instr in enumerate(i_list):
             if instr.get_opcode() == 'LABEL':
-                if instr.get_label_name() == label:
-                    return index - 1
-        self.error_exit(52, "label not defined -", label)
+                label = instr.get_label_name()
+                if label in labels:
+                    instr.error_exit(52, "label already exists -", label)
+                # run increments instruction number after the jump
+                labels[label] = index - 1
+        for instr in i_list:
+            if instr.is_branch:
+                label = instr.get_label_name()
+                if label not in labels:
+                    instr.error_exit(52, "label not defined -", label)
+                instr.target = labels[label]
+
+    def resolve_slots(self, scopes : i_scopes.program_scopes):
+        """
+        Assigns global frame slot to every GF variable argument
+        """
+        gf = scopes.gf_scope
+        for instr in self.get_list():
+            for arg in instr.get_args():
+                if arg and arg.get_type() == i_types.VAR and arg.get_value(instr)[:3] == 'GF@':
+                    arg.slot = gf.get_slot(arg.get_value(instr)[3:])
 
     def get_list(self):
         return self.instr_list
+
+    def get_args(self):
+        return []
     
     def get_order(self):
         return self.order
@@ -108,107 +160,87 @@ class instruction:
 
 # no arguments
 class no_arg_instr(instruction):
-    def __init__(self, order : int):
-        super().__init__(order)
+    pass
 
 class instr_createframe(no_arg_instr):
-    def __init__(self, order : int):
-        super().__init__(order)
-        self.opcode = "CREATEFRAME"
+    opcode = "CREATEFRAME"
 
     def execute(self, scopes : i_scopes.program_scopes):
         scopes.createframe()
 
 class instr_pushframe(no_arg_instr):
-    def __init__(self, order : int):
-        super().__init__(order)
-        self.opcode = "PUSHFRAME"
+    opcode = "PUSHFRAME"
 
     def execute(self, scopes : i_scopes.program_scopes):
         scopes.pushframe(self)
 
 class instr_popframe(no_arg_instr):
-    def __init__(self, order : int):
-        super().__init__(order)
-        self.opcode = "POPFRAME"
+    opcode = "POPFRAME"
 
     def execute(self, scopes : i_scopes.program_scopes):
         scopes.popframe(self)
 
 class instr_return(no_arg_instr):
-    def __init__(self, order : int):
-        super().__init__(order)
-        self.opcode = "RETURN"
+    opcode = "RETURN"
 
     def execute(self, scopes: i_scopes.program_scopes):
         index = scopes.get_return_num(self) - 1
         scopes.set_intr_num(index)
 
 class instr_break(no_arg_instr):
-    def __init__(self, order : int):
-        super().__init__(order)
-        self.opcode = "BREAK"
+    opcode = "BREAK"
 
     def execute(self, scopes: i_scopes.program_scopes):
-        message = "Break info:\n\ton instruction number " + str(scopes.get_instr_num())
-        # TODO more break info
-        print(message, file=sys.stderr)
+        lines = ["Break info:", "\ton instruction number " + str(scopes.get_instr_num())]
+        if i_trace.trace_buffer.active:
+            lines += i_trace.trace_buffer.active.lines()
+        lines += i_trace.state_lines(scopes)
+        i_func.output_buffer.flush_active()
+        print('\n'.join(lines), file=sys.stderr)
 
 # one argument
 class one_arg_instr(instruction):
+    __slots__ = ('arg1',)
     def __init__(self, order : int, arg1 : argument):
         super().__init__(order)       
         self.arg1 = arg1
+
+    def get_args(self):
+        return [self.arg1]
         
 class instr_defvar(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "DEFVAR"
+    opcode = "DEFVAR"
     
     def execute(self, scopes):
-        scopes.def_var(self, self.arg1.get_value(self))
+        scopes.def_arg_var(self, self.arg1)
 
 class instr_pops(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "POPS"
+    opcode = "POPS"
 
     def execute(self, scopes: i_scopes.program_scopes):
-        var = scopes.pop_stack(self)
-        scopes.set_var(self, self.arg1.get_value(self), var.get_value(self), var.get_type())
+        value_type, value = scopes.stack.pop(self)
+        scopes.set_arg_var(self, self.arg1, value, value_type)
 
 class instr_pushs(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "PUSHS"
+    opcode = "PUSHS"
 
     def execute(self, scopes: i_scopes.program_scopes):
-        symb_val = i_func.get_symb_value(self, scopes, self.arg1)
-        var = i_scopes.variable()
-        var.set_value(symb_val, self.arg1.get_type())
-        scopes.push_stack(var)
+        symb_val, symb_type = i_func.get_symb(self, scopes, self.arg1)
+        scopes.stack.push(symb_type, symb_val)
 
 class instr_write(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "WRITE"
+    opcode = "WRITE"
     
     def execute(self, scopes : i_scopes.program_scopes):
-        symb_val = i_func.get_symb_value(self, scopes, self.arg1)
-        symb_type = i_func.get_symb_type(self, scopes, self.arg1)
-        to_print = i_func.value_for_print(symb_val)
-        if symb_type == 'nil':
-            print('', end='')
-        else:
-            print(to_print, end='')
+        symb_val, symb_type = i_func.get_symb(self, scopes, self.arg1)
+        if symb_type != i_types.NIL:
+            scopes.output.write(str(i_func.value_for_print(symb_val)))
 
 class instr_exit(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "EXIT"
+    opcode = "EXIT"
 
     def execute(self, scopes: i_scopes.program_scopes):
-        ret_val = i_func.get_symb_value(self, scopes, self.arg1)
+        ret_val = i_func.get_symb(self, scopes, self.arg1)[0]
         if type(ret_val) == int and ret_val >= 0 and ret_val <= 49:
             exit(ret_val)
         elif type(ret_val) != int:
@@ -217,180 +249,187 @@ class instr_exit(one_arg_instr):
             self.error_exit(57,  f"wrong exit code -", ret_val)
 
 class instr_dprint(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "DPRINT"
+    opcode = "DPRINT"
 
     def execute(self, scopes: i_scopes.program_scopes):
-        val = i_func.get_symb_type(self, scopes, self.arg1)
-        to_print = i_func.value_for_print(val)
+        val = i_func.get_symb(self, scopes, self.arg1)[1]
+        to_print = i_types.type_name(val)
+        i_func.output_buffer.flush_active()
         print(to_print, end='', file=sys.stderr)      
 
 class instr_call(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "CALL"
+    __slots__ = ('target',)
+    is_branch = True
+    opcode = "CALL"
+
+    def get_label_name(self):
+        return self.arg1.get_value(self)
 
     def execute(self, scopes: i_scopes.program_scopes):
-        label = self.arg1.get_value(self)
-        index = self.find_label(label)
-        scopes.set_return_num(self.order)
-        scopes.set_intr_num(index)
+        # return to the next instruction, orders do not have to follow each other
+        scopes.set_return_num(scopes.get_instr_num() + 1)
+        scopes.set_intr_num(self.target)
 
 class instr_label(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "LABEL"
+    opcode = "LABEL"
     
     def get_label_name(self):
         return self.arg1.get_value(self)
 
     def execute(self, scopes: i_scopes.program_scopes):
-        i_list = self.get_list()
-        for instr in i_list:
-            if instr.get_order() > self.order:
-                return
-            if instr.get_opcode() == 'LABEL':
-                if instr.get_label_name() == self.arg1.get_value(self):
-                    if instr.get_order() != self.order:
-                        self.error_exit(52, f"label already exists -", self.arg1.get_value(self))
-
+        # labels are resolved before the program runs
+        pass
 
 class instr_jump(one_arg_instr):
-    def __init__(self, order : int, arg1 : argument):
-        super().__init__(order, arg1)
-        self.opcode = "JUMP"
+    __slots__ = ('target',)
+    is_branch = True
+    opcode = "JUMP"
+
+    def get_label_name(self):
+        return self.arg1.get_value(self)
 
     def execute(self, scopes: i_scopes.program_scopes):
-        label = self.arg1.get_value(self)
-        index = self.find_label(label)
-        scopes.set_intr_num(index)
+        scopes.set_intr_num(self.target)
 
 # two arguments
 class two_arg_instr(instruction):
+    __slots__ = ('arg1', 'arg2')
     def __init__(self, order : int, arg1 : argument, arg2 : argument):
         super().__init__(order)       
         self.arg1 = arg1
         self.arg2 = arg2
 
+    def get_args(self):
+        return [self.arg1, self.arg2]
+
 class instr_move(two_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument):
-        super().__init__(order, arg1, arg2)
-        self.opcode = "MOVE"
+    opcode = "MOVE"
     
     def execute(self, scopes):
-        symb = i_func.get_symb_value(self, scopes, self.arg2)
-        symb_type = i_func.get_symb_type(self, scopes, self.arg2)
-        scopes.set_var(self, self.arg1.get_value(self), symb, symb_type)
+        symb, symb_type = i_func.get_symb(self, scopes, self.arg2)
+        scopes.set_arg_var(self, self.arg1, symb, symb_type)
 
 class instr_int2char(two_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument):
-        super().__init__(order, arg1, arg2)
-        self.opcode = "INT2CHAR"
+    opcode = "INT2CHAR"
     
     def execute(self, scopes: i_scopes.program_scopes):
-        symb = i_func.get_symb_value(self, scopes, self.arg2)
+        symb, symb_type = i_func.get_symb(self, scopes, self.arg2)
         try:
-            if i_func.get_symb_type(self, scopes, self.arg2) != 'int':
+            if symb_type != i_types.INT:
                 raise TypeError
             symb = chr(symb)
-            scopes.set_var(self, self.arg1.get_value(self), symb, 'string')       
+            scopes.set_arg_var(self, self.arg1, symb, i_types.STRING)       
         except ValueError:
             self.error_exit(58, f"invalid value -", symb)
         except TypeError:
             self.error_exit(53, f"wrong operand types -", symb)
 
 class instr_strlen(two_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument):
-        super().__init__(order, arg1, arg2)
-        self.opcode = "STRLEN"
+    opcode = "STRLEN"
 
     def execute(self, scopes: i_scopes.program_scopes):
-        symb = i_func.get_symb_value(self, scopes, self.arg2)
-        if i_func.get_symb_type(self, scopes, self.arg2) != 'string':
+        symb, symb_type = i_func.get_symb_raw(self, scopes, self.arg2)
+        if symb_type != i_types.STRING:
             self.error_exit(53, f"wrong operand types -", symb)
         symb = len(symb)
-        scopes.set_var(self, self.arg1.get_value(self), symb, 'int')
+        scopes.set_arg_var(self, self.arg1, symb, i_types.INT)
 
 class instr_type(two_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument):
-        super().__init__(order, arg1, arg2)
-        self.opcode = "TYPE"
+    opcode = "TYPE"
     
     def execute(self, scopes: i_scopes.program_scopes):
         val_type = i_func.get_symb_type_no_err(self, scopes, self.arg2)
-        scopes.set_var(self, self.arg1.get_value(self), val_type, 'string')        
+        scopes.set_arg_var(self, self.arg1, i_types.type_name(val_type), i_types.STRING)        
 
 class instr_not(two_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument):
-        super().__init__(order, arg1, arg2)
-        self.opcode = "NOT"
+    opcode = "NOT"
     
     def execute(self, scopes: i_scopes.program_scopes):
-        symb = i_func.get_symb_value(self, scopes, self.arg2)
-        if i_func.get_symb_type(self, scopes, self.arg2) != 'bool':
+        symb, symb_type = i_func.get_symb(self, scopes, self.arg2)
+        if symb_type != i_types.BOOL:
             self.error_exit(53, f"wrong operand types -", symb)
         symb = not(symb)
-        scopes.set_var(self, self.arg1.get_value(self), symb, 'bool')
+        scopes.set_arg_var(self, self.arg1, symb, i_types.BOOL)
             
 
+# conversions of read line, return value and type
+def read_string(val : str):
+    return val, i_types.STRING
+
+def read_int(val : str):
+    try:
+        return int(val), i_types.INT
+    except ValueError:
+        return i_types.nil, i_types.NIL
+
+def read_bool(val : str):
+    return val.lower() == 'true', i_types.BOOL
+
+def read_invalid(val : str):
+    return i_types.nil, i_types.NIL
+
+read_conversions = {
+    'string' : read_string,
+    'int' : read_int,
+    'bool' : read_bool
+}
+
 class instr_read(two_arg_instr):
+    __slots__ = ('convert',)
+    opcode = "READ"
+
     def __init__(self, order : int, arg1 : argument, arg2 : argument):
         super().__init__(order, arg1, arg2)
-        self.opcode = "READ"
+        # conversion is chosen once by type in arg2
+        self.convert = read_invalid
+        if arg2:
+            self.convert = read_conversions.get(arg2.get_value(self), read_invalid)
 
-    def execute(self, scopes: i_scopes.program_scopes, input_file):
-        try:
-            val = input_file.readline()
-            if val:
-                if val[-1] == "\n":
-                    val = val[:-1]                
-        except EOFError:
-                scopes.set_var(self, self.arg1.get_value(self), 'nil', 'nil')
-                return
-        read_type = self.arg2.get_value(self)
-        if val:            
-            try:
-                var = self.arg1.get_value(self)
-                if read_type == 'string':
-                    scopes.set_var(self, var, val, self.arg2.get_value(self))
-                elif read_type == 'int':
-                    val = int(val)
-                    scopes.set_var(self, var, val, self.arg2.get_value(self))
-                elif read_type == 'bool':
-                    if val.lower() == 'true':
-                        val = True
-                    else:
-                        val = False
-                    scopes.set_var(self, var, val, self.arg2.get_value(self))
-                else:
-                    raise ValueError
-            except ValueError:
-                scopes.set_var(self, var, 'nil', 'nil')
+    def execute(self, scopes: i_scopes.program_scopes):
+        val = scopes.input.readline()
+        # empty line and end of input are read as nil
+        if val:
+            val, val_type = self.convert(val)
         else:
-            scopes.set_var(self, self.arg1.get_value(self), 'nil', 'nil')
+            val, val_type = i_types.nil, i_types.NIL
+        scopes.set_arg_var(self, self.arg1, val, val_type)
 
 # three arguments
 class three_arg_instr(instruction):    
+    __slots__ = ('arg1', 'arg2', 'arg3')
+    # operator used by process, set by instruction classes which need it
+    instr_operator = None
+    # type of result stored to arg1
+    result_type = None
     def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
         super().__init__(order)       
         self.arg1 = arg1
         self.arg2 = arg2
         self.arg3 = arg3
-        self.result = None
-        self.instr_operator = None
 
-    def execute(self, scopes : i_scopes.program_scopes, res_type : str):
-        symb1_content = i_func.get_symb_value(self, scopes, self.arg2)
-        symb2_content = i_func.get_symb_value(self, scopes, self.arg3)
+    def get_args(self):
+        return [self.arg1, self.arg2, self.arg3]
+
+    def check_types(self, symb1_type : int, symb2_type : int):
+        """
+        Exits if operands have wrong types, instructions with type rules implement their own check
+        """
+        pass
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        symb1_content, symb1_type = i_func.get_symb(self, scopes, self.arg2)
+        symb2_content, symb2_type = i_func.get_symb(self, scopes, self.arg3)
+        self.check_types(symb1_type, symb2_type)
         if self.instr_operator:
-            self.process(symb1_content, symb2_content, self.instr_operator)
+            result = self.process(symb1_content, symb2_content, self.instr_operator)
         else:
-            self.process(symb1_content, symb2_content)
-        var = self.arg1
-        scopes.set_var(self, var.get_value(self), self.result, res_type)
+            result = self.process(symb1_content, symb2_content)
+        scopes.set_arg_var(self, self.arg1, result, self.result_type)
+        return result
 
 class arithmetic_instr(three_arg_instr):
+    result_type = i_types.INT
+
     def process(self, op1, op2, myoperator):
         if not (type(op1) == int and type(op2) == int):
             self.error_exit(53, f"wrong operand types -", op1, op2)
@@ -398,292 +437,580 @@ class arithmetic_instr(three_arg_instr):
             res = int(myoperator(op1, op2))
         except ZeroDivisionError:
             self.error_exit(57, "zero devision")
-        self.result = res
-    
-    def execute(self, scopes : i_scopes.program_scopes):
-        super().execute(scopes, 'int')
+        return res
 
 class instr_add(arithmetic_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "ADD"
-        self.instr_operator = operator.add    
+    opcode = "ADD"
+    instr_operator = operator.add
 
 class instr_sub(arithmetic_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "SUB"
-        self.instr_operator = operator.sub
+    opcode = "SUB"
+    instr_operator = operator.sub
 
 class instr_mul(arithmetic_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "MUL"
-        self.instr_operator = operator.mul
+    opcode = "MUL"
+    instr_operator = operator.mul
 
 class instr_idiv(arithmetic_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "IDIV"
-        self.instr_operator = operator.floordiv
+    opcode = "IDIV"
+    instr_operator = operator.floordiv
 
 class relation_instr(three_arg_instr):
+    result_type = i_types.BOOL
+
     def process(self, op1, op2, myoperator):
         try:
             res = myoperator(op1, op2)
         except TypeError:
             self.error_exit(53, f"wrong operand types -", op1, op2)
-        self.result = res
+        return res
 
-    def execute(self, scopes: i_scopes.program_scopes):
-        symb1_type = i_func.get_symb_type(self, scopes, self.arg2)
-        symb2_type = i_func.get_symb_type(self, scopes, self.arg3)
-        if self.opcode != "EQ" and (symb1_type == 'nil' or symb2_type == 'nil' or symb1_type != symb2_type):
+    def check_types(self, symb1_type : int, symb2_type : int):
+        if self.opcode != "EQ" and (symb1_type != symb2_type or symb1_type == i_types.NIL):
             self.error_exit(53, f"wrong operand types -", self.arg2.get_value(self), self.arg3.get_value(self))
-        if self.opcode == "EQ" and (symb1_type != 'nil' and symb2_type != 'nil' and symb1_type != symb2_type):
+        if self.opcode == "EQ" and symb1_type != symb2_type and not (symb1_type | symb2_type) & i_types.NIL:
             self.error_exit(53, f"wrong operand types -", self.arg2.get_value(self), self.arg3.get_value(self))
-        super().execute(scopes, 'bool')
 
 class instr_lt(relation_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "LT"
-        self.instr_operator = operator.lt
+    opcode = "LT"
+    instr_operator = operator.lt
 
 class instr_gt(relation_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "GT"
-        self.instr_operator = operator.gt
+    opcode = "GT"
+    instr_operator = operator.gt
 
 class instr_eq(relation_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "EQ"
-        self.instr_operator = operator.eq
+    opcode = "EQ"
+    instr_operator = operator.eq
 
 class logical_instr(three_arg_instr):
+    result_type = i_types.BOOL
+
     def process(self, op1, op2, myoperator):
         try:
             res = myoperator(op1, op2)
         except TypeError:
             self.error_exit(53, f"wrong operand types -", op1, op2)
-        self.result = res
+        return res
 
-    def execute(self, scopes: i_scopes.program_scopes):
-        symb1_type = i_func.get_symb_type(self, scopes, self.arg2)
-        symb2_type = i_func.get_symb_type(self, scopes, self.arg3)
-        if not (symb1_type == symb2_type and symb1_type == 'bool'):
+    def check_types(self, symb1_type : int, symb2_type : int):
+        if symb1_type | symb2_type != i_types.BOOL:
             self.error_exit(53, f"wrong operand types -", self.arg2.get_value(self), self.arg3.get_value(self))
-        super().execute(scopes, 'bool')
 
 class instr_and(logical_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "AND"
-        self.instr_operator = operator.and_
+    opcode = "AND"
+    instr_operator = operator.and_
 
 class instr_or(logical_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "OR"
-        self.instr_operator = operator.or_
+    opcode = "OR"
+    instr_operator = operator.or_
 
 
 class instr_stri2int(three_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "STRI2INT"
+    opcode = "STRI2INT"
+    result_type = i_types.INT
 
     def process(self, op1, op2):
         try:
             if op2 < 0:
                 raise IndexError
-            self.result = ord(op1[op2])
+            return ord(op1[op2])
         except TypeError:
             self.error_exit(53, f"wrong operand types -", op1, op2)
         except IndexError:
             self.error_exit(58, "index out of range")
         
-    def execute(self, scopes : i_scopes.program_scopes):
-        symb1_type = i_func.get_symb_type(self, scopes, self.arg2)
-        symb2_type = i_func.get_symb_type(self, scopes, self.arg3)
-        if not (symb1_type == 'string' and symb2_type == 'int'):
+    def check_types(self, symb1_type : int, symb2_type : int):
+        if symb1_type != i_types.STRING or symb2_type != i_types.INT:
             self.error_exit(53, f"wrong operand types -", self.arg2.get_value(self), self.arg3.get_value(self))
-        super().execute(scopes, 'int')
 
 class instr_concat(three_arg_instr):
+    __slots__ = ('appends',)
+    opcode = "CONCAT"
+    result_type = i_types.STRING
+
     def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
         super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "CONCAT"
+        # CONCAT x x y appends to buffer of x instead of creating a new string
+        self.appends = (arg1 is not None and arg2 is not None and arg2.get_type() == i_types.VAR
+                        and arg1.get_value(self) == arg2.get_value(self))
 
     def process(self, op1, op2):
-        self.result = op1 + op2
+        return op1 + op2
     
-    def execute(self, scopes : i_scopes.program_scopes):
-        symb1_type = i_func.get_symb_type(self, scopes, self.arg2)
-        symb2_type = i_func.get_symb_type(self, scopes, self.arg3)
-        if symb1_type != 'string' or symb2_type != 'string':
+    def check_types(self, symb1_type : int, symb2_type : int):
+        if symb1_type | symb2_type != i_types.STRING:
             self.error_exit(53, f"wrong operand types -", self.arg1.get_value(self), self.arg2.get_value(self))
-        super().execute(scopes, 'string')
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        if not self.appends:
+            return super().execute(scopes)
+        var = scopes.get_arg_var(self, self.arg2)
+        if not var.initialized and var.buffer is None:
+            self.error_exit(56, f"variable not initialized")
+        symb2_content, symb2_type = i_func.get_symb(self, scopes, self.arg3)
+        self.check_types(var.var_type, symb2_type)
+        var.get_buffer().append(symb2_content)
 
 class instr_getchar(three_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "GETCHAR"
+    opcode = "GETCHAR"
+    result_type = i_types.STRING
 
     def process(self, op1, op2):
-        if not (type(op1) == str and type(op2) == int):
-            self.error_exit(53, f"wrong operand types -", op1, op2)
         try:
             if op2 < 0:
                 raise IndexError
-            self.result = ord(op1[op2])
+            return op1[op2]
         except IndexError:
             self.error_exit(58, "index out of range")
-        self.result = op1[op2]
     
-    def execute(self, scopes : i_scopes.program_scopes):
-        symb1_type = i_func.get_symb_type(self, scopes, self.arg2)
-        symb2_type = i_func.get_symb_type(self, scopes, self.arg3)
-        if symb1_type != 'string' or symb2_type != 'int':
+    def check_types(self, symb1_type : int, symb2_type : int):
+        if symb1_type != i_types.STRING or symb2_type != i_types.INT:
             self.error_exit(53, f"wrong operand types -", self.arg1.get_value(self), self.arg2.get_value(self))
-        super().execute(scopes, 'string')
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        # buffered string is indexed without joining
+        symb1_content, symb1_type = i_func.get_symb_raw(self, scopes, self.arg2)
+        symb2_content, symb2_type = i_func.get_symb(self, scopes, self.arg3)
+        self.check_types(symb1_type, symb2_type)
+        scopes.set_arg_var(self, self.arg1, self.process(symb1_content, symb2_content), i_types.STRING)
 
 class instr_setchar(three_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "SETCHAR"
+    opcode = "SETCHAR"
 
-    def process(self, var, op1, op2):
-        if not (type(var) == str and type(op1) == int and type(op2) == str):
-            self.error_exit(53, f"wrong operand types -", op1, op2)
-        try:
-            if op1 < 0 or op1 >= len(var):
-                raise IndexError
-            if len(op2) <= 0:
-                self.error_exit(58, "empty string")
-            var = var[:op1] + op2[0] + var[op1+1:]
-        except IndexError:
-            self.error_exit(58, "index out of range")
-        self.result = var
-    
     def execute(self, scopes : i_scopes.program_scopes):
-        var_val = i_func.get_symb_value(self, scopes, self.arg1)
-        symb1_val = i_func.get_symb_value(self, scopes, self.arg2)
-        symb2_val = i_func.get_symb_value(self, scopes, self.arg3)
-        var_type = i_func.get_symb_type(self, scopes, self.arg1)
-        symb1_type = i_func.get_symb_type(self, scopes, self.arg2)
-        symb2_type = i_func.get_symb_type(self, scopes, self.arg3)
-        if var_type != 'string' or symb1_type != 'int' or symb2_type != 'string':
+        var_val, var_type = i_func.get_symb_raw(self, scopes, self.arg1)
+        symb1_val, symb1_type = i_func.get_symb(self, scopes, self.arg2)
+        symb2_val, symb2_type = i_func.get_symb(self, scopes, self.arg3)
+        if var_type | symb2_type != i_types.STRING or symb1_type != i_types.INT:
             self.error_exit(53, f"wrong operand types -", self.arg2.get_value(self), self.arg3.get_value(self))
-        self.process(var_val, symb1_val, symb2_val)
-        scopes.set_var(self, self.arg1.get_value(self), self.result, 'string')
+        if symb1_val < 0 or symb1_val >= len(var_val):
+            self.error_exit(58, "index out of range")
+        if len(symb2_val) <= 0:
+            self.error_exit(58, "empty string")
+        # the character is changed in buffer of the variable, the string is not rebuilt
+        scopes.get_arg_var(self, self.arg1).get_buffer().set_char(symb1_val, symb2_val[0])
 
 class instr_jumpifeq(three_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "JUMPIFEQ"
+    __slots__ = ('target',)
+    is_branch = True
+    opcode = "JUMPIFEQ"
+
+    def get_label_name(self):
+        return self.arg1.get_value(self)
 
     def execute(self, scopes: i_scopes.program_scopes):
         condition = False
-        symb1_type = i_func.get_symb_type(self, scopes, self.arg2)
-        symb2_type = i_func.get_symb_type(self, scopes, self.arg3)
-        if (symb1_type != 'nil' and symb2_type != 'nil' and symb1_type != symb2_type):
+        symb1_val, symb1_type = i_func.get_symb(self, scopes, self.arg2)
+        symb2_val, symb2_type = i_func.get_symb(self, scopes, self.arg3)
+        if symb1_type != symb2_type and not (symb1_type | symb2_type) & i_types.NIL:
             self.error_exit(53, f"wrong operand types -", self.arg2.get_value(self), self.arg3.get_value(self))
-        symb1_val = i_func.get_symb_value(self, scopes, self.arg2)
-        symb2_val = i_func.get_symb_value(self, scopes, self.arg3)
         if symb1_val == symb2_val:
             condition = True
-        label = self.arg1.get_value(self)
-        index = self.find_label(label)
         if condition:
-            scopes.set_intr_num(index)
+            scopes.set_intr_num(self.target)
 
 class instr_jumpifneq(three_arg_instr):
-    def __init__(self, order : int, arg1 : argument, arg2 : argument, arg3 : argument):
-        super().__init__(order, arg1, arg2, arg3)
-        self.opcode = "JUMPIFNEQ"
+    __slots__ = ('target',)
+    is_branch = True
+    opcode = "JUMPIFNEQ"
+
+    def get_label_name(self):
+        return self.arg1.get_value(self)
 
     def execute(self, scopes: i_scopes.program_scopes):
         condition = False
-        symb1_type = i_func.get_symb_type(self, scopes, self.arg2)
-        symb2_type = i_func.get_symb_type(self, scopes, self.arg3)
-        if (symb1_type != 'nil' and symb2_type != 'nil' and symb1_type != symb2_type):
+        symb1_val, symb1_type = i_func.get_symb(self, scopes, self.arg2)
+        symb2_val, symb2_type = i_func.get_symb(self, scopes, self.arg3)
+        if symb1_type != symb2_type and not (symb1_type | symb2_type) & i_types.NIL:
             self.error_exit(53, f"wrong operand types -", self.arg2.get_value(self), self.arg3.get_value(self))
-        symb1_val = i_func.get_symb_value(self, scopes, self.arg2)
-        symb2_val = i_func.get_symb_value(self, scopes, self.arg3)
         if symb1_val == symb2_val:
             condition = True
-        label = self.arg1.get_value(self)
-        index = self.find_label(label)
         if not condition:
-            scopes.set_intr_num(index)
+            scopes.set_intr_num(self.target)
+
+# stack instructions, operands are taken from the data stack
+class instr_clears(no_arg_instr):
+    opcode = "CLEARS"
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        scopes.stack.clear()
+
+class stack_arithmetic_instr(no_arg_instr):
+    instr_operator = None
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        type1, op1, type2, op2 = scopes.stack.pop_pair(self)
+        if type1 | type2 != i_types.INT:
+            self.error_exit(53, f"wrong operand types -", op1, op2)
+        try:
+            res = int(self.instr_operator(op1, op2))
+        except ZeroDivisionError:
+            self.error_exit(57, "zero devision")
+        scopes.stack.push(i_types.INT, res)
+
+class instr_adds(stack_arithmetic_instr):
+    opcode = "ADDS"
+    instr_operator = operator.add
+
+class instr_subs(stack_arithmetic_instr):
+    opcode = "SUBS"
+    instr_operator = operator.sub
+
+class instr_muls(stack_arithmetic_instr):
+    opcode = "MULS"
+    instr_operator = operator.mul
+
+class instr_idivs(stack_arithmetic_instr):
+    opcode = "IDIVS"
+    instr_operator = operator.floordiv
+
+class stack_relation_instr(no_arg_instr):
+    instr_operator = None
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        type1, op1, type2, op2 = scopes.stack.pop_pair(self)
+        if self.opcode != "EQS" and (type1 != type2 or type1 == i_types.NIL):
+            self.error_exit(53, f"wrong operand types -", op1, op2)
+        if self.opcode == "EQS" and type1 != type2 and not (type1 | type2) & i_types.NIL:
+            self.error_exit(53, f"wrong operand types -", op1, op2)
+        scopes.stack.push(i_types.BOOL, self.instr_operator(op1, op2))
+
+class instr_lts(stack_relation_instr):
+    opcode = "LTS"
+    instr_operator = operator.lt
+
+class instr_gts(stack_relation_instr):
+    opcode = "GTS"
+    instr_operator = operator.gt
+
+class instr_eqs(stack_relation_instr):
+    opcode = "EQS"
+    instr_operator = operator.eq
+
+class stack_logical_instr(no_arg_instr):
+    instr_operator = None
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        type1, op1, type2, op2 = scopes.stack.pop_pair(self)
+        if type1 | type2 != i_types.BOOL:
+            self.error_exit(53, f"wrong operand types -", op1, op2)
+        scopes.stack.push(i_types.BOOL, self.instr_operator(op1, op2))
+
+class instr_ands(stack_logical_instr):
+    opcode = "ANDS"
+    instr_operator = operator.and_
+
+class instr_ors(stack_logical_instr):
+    opcode = "ORS"
+    instr_operator = operator.or_
+
+class instr_nots(no_arg_instr):
+    opcode = "NOTS"
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        symb_type, symb = scopes.stack.pop(self)
+        if symb_type != i_types.BOOL:
+            self.error_exit(53, f"wrong operand types -", symb)
+        scopes.stack.push(i_types.BOOL, not symb)
+
+class instr_int2chars(no_arg_instr):
+    opcode = "INT2CHARS"
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        symb_type, symb = scopes.stack.pop(self)
+        if symb_type != i_types.INT:
+            self.error_exit(53, f"wrong operand types -", symb)
+        try:
+            scopes.stack.push(i_types.STRING, chr(symb))
+        except ValueError:
+            self.error_exit(58, f"invalid value -", symb)
+
+class instr_stri2ints(no_arg_instr):
+    opcode = "STRI2INTS"
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        type1, op1, type2, op2 = scopes.stack.pop_pair(self)
+        if type1 != i_types.STRING or type2 != i_types.INT:
+            self.error_exit(53, f"wrong operand types -", op1, op2)
+        if op2 < 0 or op2 >= len(op1):
+            self.error_exit(58, "index out of range")
+        scopes.stack.push(i_types.INT, ord(op1[op2]))
+
+class stack_jump_instr(one_arg_instr):
+    __slots__ = ('target',)
+    is_branch = True
+    # jump when operands are equal, otherwise when they differ
+    jump_if_equal = True
+
+    def get_label_name(self):
+        return self.arg1.get_value(self)
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        type1, op1, type2, op2 = scopes.stack.pop_pair(self)
+        if type1 != type2 and not (type1 | type2) & i_types.NIL:
+            self.error_exit(53, f"wrong operand types -", op1, op2)
+        if (op1 == op2) == self.jump_if_equal:
+            scopes.set_intr_num(self.target)
+
+class instr_jumpifeqs(stack_jump_instr):
+    opcode = "JUMPIFEQS"
+
+class instr_jumpifneqs(stack_jump_instr):
+    opcode = "JUMPIFNEQS"
+    jump_if_equal = False
+
+# fused instructions, created by factory.fuse_instructions
+class fused_instr(instruction):
+    """
+    A class to represent sequence of instructions executed by one dispatch
+
+    Fused instruction takes the place of the first instruction of the sequence, the other ones stay
+    in the list, so indexes, jump targets and return addresses do not change
+    """
+    __slots__ = ('parts', 'last')
+    def __init__(self, parts : tuple, last : int):
+        # not added to instr_list, fuse_instructions puts it in place of the first part
+        self.order = parts[0].order
+        self.parts = parts
+        # index of the last part, the run continues after it
+        self.last = last
+
+class instr_compare_branch(fused_instr):
+    """
+    LT, GT or EQ to variable followed by JUMPIFEQ or JUMPIFNEQ comparing the variable with bool constant
+    """
+    __slots__ = ('compare', 'branch', 'jump_on')
+    opcode = "COMPARE+JUMPIF"
+    def __init__(self, compare : relation_instr, branch : three_arg_instr, last : int, jump_on : bool):
+        super().__init__((compare, branch), last)
+        self.compare = compare
+        self.branch = branch
+        # result of comparison which leads to jump
+        self.jump_on = jump_on
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        # the branch cannot fail, the variable was just set to bool
+        if self.compare.execute(scopes) == self.jump_on:
+            scopes.set_intr_num(self.branch.target)
+        else:
+            scopes.set_intr_num(self.last)
+
+class instr_defvar_move(fused_instr):
+    opcode = "DEFVAR+MOVE"
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        self.parts[0].execute(scopes)
+        self.parts[1].execute(scopes)
+        scopes.set_intr_num(self.last)
+
+class instr_frame_call(fused_instr):
+    opcode = "CREATEFRAME+PUSHFRAME+CALL"
+
+    def execute(self, scopes : i_scopes.program_scopes):
+        scopes.createframe()
+        scopes.pushframe(self.parts[1])
+        # return after CALL, the last part
+        scopes.set_return_num(self.last + 1)
+        scopes.set_intr_num(self.parts[2].target)
+
+# opcode tables used by factory
+no_argument = {
+    'CREATEFRAME' : instr_createframe,
+    'PUSHFRAME' : instr_pushframe,
+    'POPFRAME' : instr_popframe,
+    'RETURN' : instr_return,
+    'BREAK' : instr_break,
+    'CLEARS' : instr_clears,
+    'ADDS' : instr_adds,
+    'SUBS' : instr_subs,
+    'MULS' : instr_muls,
+    'IDIVS' : instr_idivs,
+    'LTS' : instr_lts,
+    'GTS' : instr_gts,
+    'EQS' : instr_eqs,
+    'ANDS' : instr_ands,
+    'ORS' : instr_ors,
+    'NOTS' : instr_nots,
+    'INT2CHARS' : instr_int2chars,
+    'STRI2INTS' : instr_stri2ints
+}
+one_argument = {
+    'DEFVAR' : instr_defvar,
+    'POPS' : instr_pops,
+    'PUSHS' : instr_pushs,
+    'WRITE' : instr_write,
+    'EXIT' : instr_exit,
+    'DPRINT' : instr_dprint,
+    'CALL' : instr_call,
+    'LABEL' : instr_label,
+    'JUMP' : instr_jump,
+    'JUMPIFEQS' : instr_jumpifeqs,
+    'JUMPIFNEQS' : instr_jumpifneqs
+}
+two_arguments = {
+    'MOVE':instr_move,
+    'INT2CHAR' : instr_int2char,
+    'STRLEN' : instr_strlen,
+    'TYPE' : instr_type,
+    'NOT' : instr_not,
+    'READ' : instr_read
+}
+three_arguments = {
+    'ADD' : instr_add,
+    'SUB' : instr_sub,
+    'MUL' : instr_mul,
+    'IDIV' : instr_idiv,
+    'LT' : instr_lt,
+    'GT' : instr_gt,
+    'EQ' : instr_eq,
+    'AND' : instr_and,
+    'OR' : instr_or,
+    'STRI2INT' : instr_stri2int,
+    'CONCAT' : instr_concat,
+    'GETCHAR' : instr_getchar,
+    'SETCHAR' : instr_setchar,
+    'JUMPIFEQ' : instr_jumpifeq,
+    'JUMPIFNEQ' : instr_jumpifneq
+}
+
+# execute methods indexed by opcode id
+dispatch_table = []
+
+def register_opcodes(*tables):
+    """
+    Assigns opcode ids to instruction classes and fills dispatch_table
+    """
+    for table in tables:
+        for instr_class in table.values():
+            instr_class.opcode_id = len(dispatch_table)
+            dispatch_table.append(instr_class.execute)
+
+# fused instructions by opcode, they are never loaded from source
+fused_instructions = {
+    'COMPARE+JUMPIF' : instr_compare_branch,
+    'DEFVAR+MOVE' : instr_defvar_move,
+    'CREATEFRAME+PUSHFRAME+CALL' : instr_frame_call
+}
+
+register_opcodes(no_argument, one_argument, two_arguments, three_arguments, fused_instructions)
 
 class factory:
+    @classmethod
+    def load_instructions(cls, source_file):
+        """
+        Reads XML source and creates instructions in one pass
+
+        Top-level elements are dropped as soon as they are processed, the whole document is never kept in memory
+        """
+        instructions = []
+        root = None
+        depth = 0
+        try:
+            for event, elem in ET.iterparse(source_file, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1:
+                    if elem.tag == 'instruction':
+                        instructions.append(cls.create_instruction(elem))
+                    del root[:]
+        except ET.ParseError:
+            i_func.error_exit_xml_format()
+        return instructions
+
+    @classmethod
+    def load_program(cls, source_file, scopes : i_scopes.program_scopes):
+        """
+        Loads instructions from XML source and prepares them for running
+
+        Returns sorted list of instructions with resolved labels and global frame slots
+        """
+        instructions = cls.load_instructions(source_file)
+        if instructions:
+            i = instructions[0]
+            i.sort_instr_list()
+            i.resolve_labels(i.get_list())
+            i.resolve_slots(scopes)
+            return i.get_list()
+        return instructions
+
+    @staticmethod
+    def branch_condition(compare : instruction, branch : instruction):
+        """
+        Returns result of compare which makes branch jump
+
+        Returns None if branch does not compare result of compare with bool constant
+        """
+        if branch.get_opcode() not in ('JUMPIFEQ', 'JUMPIFNEQ'):
+            return None
+        result = compare.arg1.get_value(compare)
+        if branch.arg2.get_type() == i_types.VAR and branch.arg3.get_type() == i_types.BOOL:
+            var, const = branch.arg2, branch.arg3
+        elif branch.arg3.get_type() == i_types.VAR and branch.arg2.get_type() == i_types.BOOL:
+            var, const = branch.arg3, branch.arg2
+        else:
+            return None
+        if var.get_value(branch) != result:
+            return None
+        if branch.get_opcode() == 'JUMPIFEQ':
+            return const.get_value(branch)
+        return not const.get_value(branch)
+
+    @classmethod
+    def fuse_instructions(cls, i_list : list) -> None:
+        """
+        Replaces common sequences of instructions by fused instructions
+
+        Labels must be already resolved, the cache and the optimizer work with the instructions before fusion
+        """
+        index = 0
+        while index < len(i_list) - 1:
+            instr = i_list[index]
+            opcode = instr.get_opcode()
+            next_instr = i_list[index + 1]
+            if opcode in ('LT', 'GT', 'EQ'):
+                jump_on = cls.branch_condition(instr, next_instr)
+                if jump_on is not None:
+                    i_list[index] = instr_compare_branch(instr, next_instr, index + 1, jump_on)
+                    index += 1
+            elif opcode == 'DEFVAR' and next_instr.get_opcode() == 'MOVE':
+                i_list[index] = instr_defvar_move((instr, next_instr), index + 1)
+                index += 1
+            elif (opcode == 'CREATEFRAME' and next_instr.get_opcode() == 'PUSHFRAME'
+                    and index + 2 < len(i_list) and i_list[index + 2].get_opcode() == 'CALL'):
+                i_list[index] = instr_frame_call((instr, next_instr, i_list[index + 2]), index + 2)
+                index += 2
+            index += 1
+
     @classmethod
     def create_instruction(cls, instr):
         """
-        Returns created instruction with all arguments
+        Returns created instruction with all arguments, the instruction is added to the shared list
         """
         order = instr.get("order")
         opcode = instr.get("opcode")
+        arg_elems = {'arg1' : [], 'arg2' : [], 'arg3' : []}
+        for child in instr:
+            if child.tag in arg_elems:
+                arg_elems[child.tag].append(child)
         args = {}
-        for i in range(1,4):
-            arg = instr.findall(f"./arg{i}")
+        for name, arg in arg_elems.items():
             if len(arg) > 1:
-                print(f"Error: instruction o.{order} {opcode}: instruction has more arguments with the same number - arg{i}", file=sys.stderr)
+                print(f"Error: instruction o.{order} {opcode}: instruction has more arguments with the same number - {name}", file=sys.stderr)
                 exit(32)
             if arg:
-                args[f"arg{i}"] = cls.get_argument(arg[0], order, opcode)
-        return cls.get_instruction(order, opcode, **args)
+                args[name] = cls.get_argument(arg[0], order, opcode)
+        created = cls.get_instruction(order, opcode, **args)
+        instruction.instr_list.append(created)
+        return created
 
     @classmethod
     def get_instruction(cls, order : int, opcode : str,
                 arg1 : argument = None, arg2 : argument = None, arg3 : argument = None):
-        no_argument = {
-            'CREATEFRAME' : instr_createframe,
-            'PUSHFRAME' : instr_pushframe,
-            'POPFRAME' : instr_popframe,
-            'RETURN' : instr_return,
-            'BREAK' : instr_break
-        }
-        one_argument = {
-            'DEFVAR' : instr_defvar,
-            'POPS' : instr_pops,
-            'PUSHS' : instr_pushs,
-            'WRITE' : instr_write,
-            'EXIT' : instr_exit,
-            'DPRINT' : instr_dprint,
-            'CALL' : instr_call,
-            'LABEL' : instr_label,
-            'JUMP' : instr_jump
-        }
-        two_arguments = {
-            'MOVE':instr_move,
-            'INT2CHAR' : instr_int2char,
-            'STRLEN' : instr_strlen,
-            'TYPE' : instr_type,
-            'NOT' : instr_not,
-            'READ' : instr_read
-        }
-        three_arguments = {
-            'ADD' : instr_add,
-            'SUB' : instr_sub,
-            'MUL' : instr_mul,
-            'IDIV' : instr_idiv,
-            'LT' : instr_lt,
-            'GT' : instr_gt,
-            'EQ' : instr_eq,
-            'AND' : instr_and,
-            'OR' : instr_or,
-            'STRI2INT' : instr_stri2int,
-            'CONCAT' : instr_concat,
-            'GETCHAR' : instr_getchar,
-            'SETCHAR' : instr_setchar,
-            'JUMPIFEQ' : instr_jumpifeq,
-            'JUMPIFNEQ' : instr_jumpifneq
-        }
         opcode = opcode.upper()
         if opcode in no_argument:
             return no_argument[opcode](order)
@@ -711,10 +1038,17 @@ class factory:
             else:
                 arg_content = False
         elif arg_type == 'string':
+            # escape sequences are decoded only here, runtime works with decoded strings
             if arg.text:
-                arg_content = arg.text
+                arg_content = sys.intern(i_func.str_escape(arg.text))
             else:
                 arg_content = ''
+        elif arg_type == 'nil':
+            arg_content = i_types.nil
         else:
             arg_content = arg.text
-        return argument(arg_type, arg_content)
+        tag = i_types.type_tag(arg_type)
+        if tag is None or tag == i_types.UNDEFINED:
+            print(f"Error: instruction o.{order} {opcode}: argument {arg.tag} has unknown type {arg_type}", file=sys.stderr)
+            exit(32)
+        return argument(tag, arg_content)
@@ -0,0 +1,190 @@
+'''
+    File name: interpret_optimizer.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Peephole optimizer of loaded instructions
+'''
+
+import interpret_instructions as i_instr
+import interpret_types as i_types
+
+class instr_folded(i_instr.instr_move):
+    """
+    MOVE of a constant computed by the optimizer
+
+    Errors are reported as by the original instruction
+    """
+    __slots__ = ('original',)
+    def __init__(self, original, arg2 : i_instr.argument):
+        super().__init__(original.order, original.arg1, arg2)
+        self.original = original
+
+    def error_exit(self, error_code, error_message, *args):
+        self.original.error_exit(error_code, error_message, *args)
+
+# instructions after which the next instruction is reached only by a jump
+unconditional = ('JUMP', 'RETURN', 'EXIT')
+# instructions which can change frames or the order of frames
+frame_changes = ('CALL', 'RETURN', 'CREATEFRAME', 'PUSHFRAME', 'POPFRAME', 'LABEL')
+# instructions writing result to variable in arg1
+writes_arg1 = ('MOVE', 'INT2CHAR', 'STRLEN', 'TYPE', 'NOT', 'READ', 'POPS', 'ADD', 'SUB', 'MUL', 'IDIV',
+                'LT', 'GT', 'EQ', 'AND', 'OR', 'STRI2INT', 'CONCAT', 'GETCHAR', 'SETCHAR')
+
+def is_const(arg) -> bool:
+    return arg is not None and arg.get_type() in (i_types.INT, i_types.BOOL, i_types.STRING, i_types.NIL)
+
+def fold_value(instr):
+    """
+    Returns argument with result of instruction with constant operands
+
+    Returns None if the instruction cannot be folded or would end with error at runtime
+    """
+    opcode = instr.get_opcode()
+    if opcode == 'NOT':
+        if is_const(instr.arg2) and instr.arg2.get_type() == i_types.BOOL:
+            return i_instr.argument(i_types.BOOL, not instr.arg2.get_value(instr))
+        return None
+    if not isinstance(instr, i_instr.three_arg_instr) or not (is_const(instr.arg2) and is_const(instr.arg3)):
+        return None
+    type1, type2 = instr.arg2.get_type(), instr.arg3.get_type()
+    op1, op2 = instr.arg2.get_value(instr), instr.arg3.get_value(instr)
+    if isinstance(instr, i_instr.arithmetic_instr):
+        if type1 | type2 != i_types.INT or (opcode == 'IDIV' and op2 == 0):
+            return None
+        return i_instr.argument(i_types.INT, int(instr.instr_operator(op1, op2)))
+    if isinstance(instr, i_instr.relation_instr):
+        if opcode == 'EQ':
+            if type1 != type2 and not (type1 | type2) & i_types.NIL:
+                return None
+        elif type1 != type2 or type1 == i_types.NIL:
+            return None
+        return i_instr.argument(i_types.BOOL, instr.instr_operator(op1, op2))
+    if isinstance(instr, i_instr.logical_instr):
+        if type1 | type2 != i_types.BOOL:
+            return None
+        return i_instr.argument(i_types.BOOL, instr.instr_operator(op1, op2))
+    return None
+
+def fold_constants(code : list) -> bool:
+    """
+    Replaces operations on constants by MOVE of their result and decides conditional jumps on constants
+    """
+    changed = False
+    for index, instr in enumerate(code):
+        opcode = instr.get_opcode()
+        if opcode in ('JUMPIFEQ', 'JUMPIFNEQ'):
+            if not (is_const(instr.arg2) and is_const(instr.arg3)):
+                continue
+            type1, type2 = instr.arg2.get_type(), instr.arg3.get_type()
+            if type1 != type2 and not (type1 | type2) & i_types.NIL:
+                continue
+            equal = instr.arg2.get_value(instr) == instr.arg3.get_value(instr)
+            if equal == (opcode == 'JUMPIFEQ'):
+                code[index] = i_instr.instr_jump(instr.order, instr.arg1)
+            else:
+                code[index] = None
+            changed = True
+        elif not isinstance(instr, instr_folded):
+            value = fold_value(instr)
+            if value is not None:
+                code[index] = instr_folded(instr, value)
+                changed = True
+    code[:] = [instr for instr in code if instr is not None]
+    return changed
+
+def find_labels(code : list) -> dict:
+    return {instr.get_label_name() : index for index, instr in enumerate(code) if instr.get_opcode() == 'LABEL'}
+
+def thread_jumps(code : list) -> bool:
+    """
+    Changes label of jumps which land on unconditional JUMP to the label of that JUMP
+    """
+    labels = find_labels(code)
+    changed = False
+    for instr in code:
+        if not instr.is_branch:
+            continue
+        label = instr.get_label_name()
+        visited = {label}
+        while True:
+            index = labels[label] + 1
+            while index < len(code) and code[index].get_opcode() == 'LABEL':
+                index += 1
+            if index == len(code) or code[index].get_opcode() != 'JUMP':
+                break
+            next_label = code[index].get_label_name()
+            if next_label in visited:
+                break
+            visited.add(next_label)
+            label = next_label
+        if label != instr.get_label_name():
+            instr.arg1 = i_instr.argument(i_types.LABEL, label)
+            changed = True
+    return changed
+
+def remove_unreachable(code : list) -> bool:
+    """
+    Removes instructions between unconditional jump, RETURN or EXIT and the next label
+    and JUMPs to the label right after them
+    """
+    kept = []
+    reachable = True
+    for instr in code:
+        if instr.get_opcode() == 'LABEL':
+            reachable = True
+        if reachable:
+            kept.append(instr)
+            if instr.get_opcode() in unconditional:
+                reachable = False
+    labels = find_labels(kept)
+    result = []
+    for index, instr in enumerate(kept):
+        if instr.get_opcode() == 'JUMP':
+            target = labels[instr.get_label_name()]
+            if target > index and all(i.get_opcode() == 'LABEL' for i in kept[index + 1:target]):
+                continue
+        result.append(instr)
+    changed = len(result) != len(code)
+    code[:] = result
+    return changed
+
+def remove_self_moves(code : list) -> bool:
+    """
+    Removes MOVE x x when x was written earlier in the same block
+
+    Then x is surely defined and initialized and removed MOVE could not end with error
+    """
+    written = set()
+    kept = []
+    for instr in code:
+        opcode = instr.get_opcode()
+        if opcode in frame_changes:
+            written.clear()
+        if opcode == 'MOVE' and instr.arg2.get_type() == i_types.VAR:
+            name = instr.arg1.get_value(instr)
+            if name == instr.arg2.get_value(instr) and name in written:
+                continue
+        kept.append(instr)
+        if opcode in writes_arg1 and instr.arg1 is not None:
+            written.add(instr.arg1.get_value(instr))
+    changed = len(kept) != len(code)
+    code[:] = kept
+    return changed
+
+def optimize(i_list : list) -> None:
+    """
+    Rewrites list of loaded instructions, labels must be already resolved
+
+    Passes are repeated until none of them changes the program
+    """
+    if not i_list:
+        return
+    for _ in range(10):
+        changed = fold_constants(i_list)
+        changed = thread_jumps(i_list) or changed
+        changed = remove_unreachable(i_list) or changed
+        changed = remove_self_moves(i_list) or changed
+        if not changed:
+            break
+    i_list[0].resolve_labels(i_list)
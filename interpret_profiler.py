@@ -0,0 +1,124 @@
+'''
+    File name: interpret_profiler.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Execution profiler counting instructions and their run time
+'''
+
+import functools
+import json
+import sys
+import time
+
+import interpret_scopes as i_scopes
+import interpret_instructions as i_instr
+
+def object_steps(scopes : i_scopes.program_scopes, i_list : list) -> list:
+    """
+    Returns execute methods of instructions bound to their instruction and scopes
+    """
+    table = i_instr.dispatch_table
+    return [functools.partial(table[instr.opcode_id], instr, scopes) for instr in i_list]
+
+def opcode_name(instr) -> str:
+    """
+    Returns opcode of instruction, fused instruction gets opcodes of its parts joined by +
+    """
+    parts = getattr(instr, 'parts', None)
+    if parts:
+        return '+'.join(part.get_opcode() for part in parts)
+    return instr.get_opcode()
+
+class profiler:
+    """
+    A class to collect execution count and time of every instruction
+
+    Profiled program runs in its own loop, the loops of the engines are not changed.
+    Fused sequence is one instruction with order of its first part, its other parts are never executed
+    """
+    def __init__(self, i_list : list):
+        self.i_list = i_list
+        self.counts = [0] * len(i_list)
+        self.times = [0.0] * len(i_list)
+
+    def run(self, scopes : i_scopes.program_scopes, steps : list) -> None:
+        """
+        Executes steps of the program and measures each of them
+        """
+        counts = self.counts
+        times = self.times
+        clock = time.perf_counter
+        end = len(steps)
+        while scopes.intr_num < end:
+            num = scopes.intr_num
+            start = clock()
+            try:
+                steps[num]()
+            finally:
+                # EXIT and errors end the program inside the step
+                times[num] += clock() - start
+                counts[num] += 1
+            scopes.intr_num += 1
+
+    def by_opcode(self) -> list:
+        """
+        Returns opcode, count and time sorted by time
+        """
+        opcodes = {}
+        for instr, count, spent in zip(self.i_list, self.counts, self.times):
+            if count:
+                stats = opcodes.setdefault(opcode_name(instr), [0, 0.0])
+                stats[0] += count
+                stats[1] += spent
+        return sorted(((op, c, t) for op, (c, t) in opcodes.items()), key=lambda x: x[2], reverse=True)
+
+    def by_order(self) -> list:
+        """
+        Returns order, opcode, count and time of executed instructions sorted by time
+        """
+        stats = [(instr.get_order(), opcode_name(instr), count, spent)
+                    for instr, count, spent in zip(self.i_list, self.counts, self.times) if count]
+        return sorted(stats, key=lambda x: x[3], reverse=True)
+
+    def to_json(self) -> str:
+        result = {
+            'total_count' : sum(self.counts),
+            'total_time' : sum(self.times),
+            'opcodes' : [{'opcode' : op, 'count' : c, 'time' : t} for op, c, t in self.by_opcode()],
+            'instructions' : [{'order' : o, 'opcode' : op, 'count' : c, 'time' : t} for o, op, c, t in self.by_order()]
+        }
+        return json.dumps(result, indent=2)
+
+    def to_table(self) -> str:
+        total = sum(self.times) or 1.0
+        by_opcode = self.by_opcode()
+        by_order = self.by_order()
+        # fused opcodes are longer than the column of plain opcodes
+        width = max([12] + [len(op) + 2 for op, c, t in by_opcode])
+        lines = [f"executed instructions: {sum(self.counts)}, time: {sum(self.times):.6f} s", '']
+        if any(count and getattr(instr, 'parts', None) for instr, count in zip(self.i_list, self.counts)):
+            lines += ["fused sequences (opcodes joined by +) are counted as one instruction,",
+                        "their parts are not counted under their own opcodes", '']
+        lines.append(f"{'opcode':<{width}}{'count':>12}{'time [s]':>14}{'%':>8}")
+        for op, count, spent in by_opcode:
+            lines.append(f"{op:<{width}}{count:>12}{spent:>14.6f}{100 * spent / total:>8.2f}")
+        lines += ['', f"{'order':>8}  {'opcode':<{width}}{'count':>12}{'time [s]':>14}{'%':>8}"]
+        for order, op, count, spent in by_order:
+            lines.append(f"{order:>8}  {op:<{width}}{count:>12}{spent:>14.6f}{100 * spent / total:>8.2f}")
+        return '\n'.join(lines) + '\n'
+
+    def report(self, destination : str) -> None:
+        """
+        Writes profile to file, JSON for files ending with .json, table otherwise
+
+        Destination '-' means stderr
+        """
+        if destination == '-':
+            print(self.to_table(), end='', file=sys.stderr)
+            return
+        with open(destination, 'w') as profile_file:
+            if destination.endswith('.json'):
+                profile_file.write(self.to_json())
+            else:
+                profile_file.write(self.to_table())
@@ -9,36 +9,106 @@
 import sys
 
 import interpret_fuctions as i_func
+import interpret_types as i_types
 
 class variable:
     """
     A class to represent a variable
+
+    String changed in place by CONCAT and SETCHAR is kept in buffer, the variable is then not initialized
+    until the buffer is joined to its value on read, so reads of initialized variables check nothing more
     """
-    def __init__(self, value = None, var_type = ''):
+    __slots__ = ('value', 'var_type', 'initialized', 'buffer')
+    def __init__(self, value = None, var_type = i_types.UNDEFINED):
         self.value = value
         self.var_type = var_type
         self.initialized = False
+        # string_buffer of string changed in place, kept after join for next changes
+        self.buffer = None
     
     def get_value(self, instr):
         if self.initialized:
             return self.value
         else:
-            instr.error_exit(56, f"variable not initialized")
+            return self.join_buffer(instr)
 
     def get_type(self):
         return self.var_type
 
     def set_value(self, value, var_type):
-        if var_type == 'string':
-            value = i_func.str_escape(value)
         self.value = value
         self.var_type = var_type
         self.initialized = True    
 
+    def join_buffer(self, instr):
+        """
+        Returns value of variable which is not initialized, string in its buffer becomes the value
+
+        Exits with 56 if the variable has no buffer
+        """
+        if self.buffer is None:
+            instr.error_exit(56, f"variable not initialized")
+        self.value = self.buffer.get()
+        self.initialized = True
+        return self.value
+
+    def get_raw_value(self, instr):
+        """
+        Returns value for measuring and indexing, string in buffer is not joined
+        """
+        if self.initialized:
+            return self.value
+        if self.buffer is None:
+            instr.error_exit(56, f"variable not initialized")
+        return self.buffer
+
+    def get_buffer(self):
+        """
+        Returns buffer with string of variable, value is not up to date until the buffer is joined
+        """
+        buffer = self.buffer
+        # value assigned since the last join replaces content of the buffer
+        if buffer is None or (self.initialized and self.value is not buffer.text):
+            buffer = self.buffer = string_buffer(self.value)
+        self.initialized = False
+        return buffer
+
+class string_buffer:
+    """
+    A class to represent string changed in place by SETCHAR and CONCAT
+
+    Characters are kept in a list, so changing a character and appending are amortized O(1),
+    the joined string is cached until the next change
+    """
+    __slots__ = ('chars', 'text')
+    def __init__(self, text : str):
+        self.chars = list(text)
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.chars)
+
+    def __getitem__(self, index : int) -> str:
+        return self.chars[index]
+
+    def get(self) -> str:
+        if self.text is None:
+            self.text = ''.join(self.chars)
+        return self.text
+
+    def set_char(self, index : int, char : str) -> None:
+        self.chars[index] = char
+        self.text = None
+
+    def append(self, text : str) -> None:
+        self.chars.extend(text)
+        self.text = None
+
 class scope:
     """
     A class to represent a scope
     """
+    __slots__ = ('var_list', 'scope_type')
     def __init__(self, scope_type):
         self.var_list = {}
         self.scope_type = scope_type
@@ -50,10 +120,10 @@ class scope:
             self.var_list[name] = variable()  
     
     def get_var(self, instr, name) -> variable:
-        if name not in self.var_list:
+        var = self.var_list.get(name)
+        if var is None:
             instr.error_exit(54, f"{self.scope_type}@{name} not defined")
-        else:
-            return self.var_list[name]
+        return var
     
     def set_scope(self, scope_type) -> None:
         self.scope_type = scope_type  
@@ -64,17 +134,147 @@ class scope:
         else:
             self.var_list[name].set_value(value, var_type)
 
+class global_scope(scope):
+    """
+    A class to represent the global frame
+
+    Variables are stored in a list, slot of every variable used in the program is resolved before running
+    """
+    __slots__ = ('slot_names', 'names', 'slots')
+    def __init__(self):
+        super().__init__('GF')
+        self.slot_names = {}
+        self.names = []
+        self.slots = []
+
+    def get_slot(self, name) -> int:
+        """
+        Returns slot of variable with given name, unknown name gets a new slot
+        """
+        slot = self.slot_names.get(name)
+        if slot is None:
+            slot = len(self.slots)
+            self.slot_names[name] = slot
+            self.names.append(name)
+            self.slots.append(None)
+        return slot
+
+    def define_var(self, instr, name) -> None:
+        self.define_slot(instr, self.get_slot(name))
+
+    def get_var(self, instr, name) -> variable:
+        slot = self.slot_names.get(name)
+        if slot is None:
+            instr.error_exit(54, f"{self.scope_type}@{name} not defined")
+        return self.get_slot_var(instr, slot)
+
+    def set_var(self, instr, name, value, var_type) -> None:
+        self.get_var(instr, name).set_value(value, var_type)
+
+    def define_slot(self, instr, slot) -> None:
+        if self.slots[slot] is not None:
+            instr.error_exit(52, f"{self.scope_type}@{self.names[slot]} already defined")
+        else:
+            self.slots[slot] = variable()
+
+    def get_slot_var(self, instr, slot) -> variable:
+        var = self.slots[slot]
+        if var is None:
+            instr.error_exit(54, f"{self.scope_type}@{self.names[slot]} not defined")
+        return var
+
+class data_stack:
+    """
+    A class to represent the data stack
+
+    Values and their types are kept in two parallel lists which only grow, top is the number of values
+    on the stack, so push and pop reuse the lists instead of allocating for every value.
+    Popped values are replaced by None, the stack does not keep them alive
+    """
+    __slots__ = ('values', 'types', 'top')
+    def __init__(self):
+        self.values = []
+        self.types = []
+        self.top = 0
+
+    def __len__(self) -> int:
+        return self.top
+
+    def push(self, value_type : int, value) -> None:
+        top = self.top
+        if top == len(self.values):
+            self.values.append(value)
+            self.types.append(value_type)
+        else:
+            self.values[top] = value
+            self.types[top] = value_type
+        self.top = top + 1
+
+    def pop(self, instr) -> tuple:
+        """
+        Returns type and value from the top of the stack
+        """
+        top = self.top - 1
+        if top < 0:
+            instr.error_exit(56, f"popping empty stack")
+        self.top = top
+        values = self.values
+        value = values[top]
+        values[top] = None
+        return self.types[top], value
+
+    def pop_pair(self, instr) -> tuple:
+        """
+        Returns type and value of the second value from the top, then type and value of the top
+        """
+        top = self.top - 2
+        if top < 0:
+            instr.error_exit(56, f"popping empty stack")
+        self.top = top
+        types = self.types
+        values = self.values
+        value1 = values[top]
+        value2 = values[top + 1]
+        values[top] = values[top + 1] = None
+        return types[top], value1, types[top + 1], value2
+
+    def clear(self) -> None:
+        self.values.clear()
+        self.types.clear()
+        self.top = 0
+
 class program_scopes:
     """
     A class to represent scopes, stack and return stack
     """
-    def __init__(self):
-        self.gf_scope = scope('GF')
+    def __init__(self, input = None, output = None):
+        self.input = input
+        self.output = output
+        self.gf_scope = global_scope()
         self.tf_scope = None
         self.lf_scopes = []
-        self.stack = []
+        self.stack = data_stack()
         self.intr_num = 0
         self.return_stack = []
+        # code compiled by engines for these scopes, by engine name
+        self.code = {}
+
+    def reset(self, input_stream, output_stream) -> None:
+        """
+        Prepares scopes for another run of the same program, code compiled for them stays valid
+
+        Frames and stacks are cleared in place because compiled code keeps references to them,
+        input and output get new streams
+        """
+        self.input.reset(input_stream)
+        self.output.reset(output_stream)
+        slots = self.gf_scope.slots
+        slots[:] = [None] * len(slots)
+        self.tf_scope = None
+        self.lf_scopes.clear()
+        self.stack.clear()
+        self.return_stack.clear()
+        self.intr_num = 0
 
     def def_var(self, instr, name) -> None:
         """
@@ -89,6 +289,7 @@ class program_scopes:
         elif scope_prefix == 'TF':
             return self.__def_tf_var(instr, var_name)
         else:
+            i_func.output_buffer.flush_active()
             print("INTERNAL ERROR: scope detection failed", file=sys.stderr)
             exit(99)
 
@@ -105,6 +306,7 @@ class program_scopes:
         elif scope_prefix == 'TF':
             return self.__get_tf_var(instr, var_name)
         else:
+            i_func.output_buffer.flush_active()
             print("INTERNAL ERROR: scope detection failed", file=sys.stderr)
             exit(99)
         
@@ -122,9 +324,50 @@ class program_scopes:
         elif scope_prefix == 'TF':
             return self.__set_tf_var(instr, var_name, value, value_type)
         else:
+            i_func.output_buffer.flush_active()
             print("INTERNAL ERROR: scope detection failed", file=sys.stderr)
             exit(99)
 
+    # variables given by instruction argument, frame and name are split at load,
+    # GF variables are accessed by slot
+    def arg_scope(self, instr, arg) -> scope:
+        """
+        Returns LF or TF scope of argument, None for other frames
+        """
+        if arg.frame == 'LF':
+            return self.__get_lf(instr)
+        if arg.frame == 'TF':
+            return self.__get_tf(instr)
+        return None
+
+    def def_arg_var(self, instr, arg) -> None:
+        if arg.slot is not None:
+            self.gf_scope.define_slot(instr, arg.slot)
+            return
+        frame = self.arg_scope(instr, arg)
+        if frame is not None:
+            frame.define_var(instr, arg.name)
+        else:
+            self.def_var(instr, arg.get_value(instr))
+
+    def get_arg_var(self, instr, arg) -> variable:
+        slot = arg.slot
+        if slot is not None:
+            var = self.gf_scope.slots[slot]
+            if var is None:
+                return self.gf_scope.get_slot_var(instr, slot)
+            return var
+        frame = self.arg_scope(instr, arg)
+        if frame is not None:
+            return frame.get_var(instr, arg.name)
+        return self.get_var(instr, arg.get_value(instr))
+
+    def set_arg_var(self, instr, arg, value, value_type) -> None:
+        var = self.get_arg_var(instr, arg)
+        var.value = value
+        var.var_type = value_type
+        var.initialized = True
+
     # frame methods
     def createframe(self) -> None:
         self.tf_scope = scope('TF')
@@ -145,16 +388,6 @@ class program_scopes:
         else:
             instr.error_exit(55, f"popping non existent LF")
 
-    # stack methods
-    def push_stack(self, var : variable) -> None:
-        self.stack.append(var)
-
-    def pop_stack(self, instr) -> variable:
-        if len(self.stack) > 0:
-            return self.stack.pop()
-        else:
-            instr.error_exit(56, f"popping empty stack")
-
     # methods for program flow
     def get_instr_num(self) -> int:
         return self.intr_num
@@ -0,0 +1,224 @@
+'''
+    File name: interpret_server.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Interpret server on Unix socket keeping loaded programs in memory
+'''
+
+import collections
+import io
+import json
+import os
+import re
+import signal
+import socket
+import socketserver
+
+import interpret
+import interpret_fuctions as i_func
+import interpret_scopes as i_scopes
+import interpret_instructions as i_instr
+import interpret_cache as i_cache
+import interpret_optimizer as i_optimizer
+
+# Request is one line with JSON header followed by source and input bytes:
+#   {"source_length": N, "input_length": M, "hash": "...", "engine": "objects", "trace": 32}\n<source><input>
+# source_length is 0 when the program is given by hash of a program sent before,
+# trace is number of traced instructions as with --trace, 0 turns off tracing set for the server.
+# Response is one line with JSON header followed by stdout and stderr bytes:
+#   {"status": "ok", "exit_code": 0, "hash": "...", "stdout_length": N, "stderr_length": M}\n<stdout><stderr>
+# status other than "ok" means the request was not run or did not finish, exit_code is null then.
+# hash is 64 lowercase hex digits, run longer than the time limit of the server is stopped.
+
+class run_timeout(BaseException):
+    """
+    Raised when a run exceeds the time limit, run_captured does not take it as an error of the program
+    """
+
+def stop_run(signum, frame):
+    raise run_timeout()
+
+class loaded_program:
+    """
+    A class to represent loaded program which can be run many times
+
+    Instructions do not change during run, every run resets the scopes the program was loaded with,
+    so closures and compiled blocks kept in them by engine are reused
+    """
+    __slots__ = ('i_list', 'scopes')
+    def __init__(self, i_list : list, scopes : i_scopes.program_scopes):
+        self.i_list = i_list
+        self.scopes = scopes
+
+class program_cache:
+    """
+    A class to keep loaded programs, the least recently used program is dropped when the cache is full
+    """
+    def __init__(self, size : int):
+        self.size = size
+        self.programs = collections.OrderedDict()
+
+    def get(self, key):
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+        return program
+
+    def put(self, key, program : loaded_program) -> None:
+        self.programs[key] = program
+        self.programs.move_to_end(key)
+        while len(self.programs) > self.size:
+            self.programs.popitem(last=False)
+
+    def __len__(self):
+        return len(self.programs)
+
+class interpret_server(socketserver.UnixStreamServer):
+    """
+    A class of the server, requests are handled one by one in the server process
+
+    Run is stopped after timeout seconds, 0 means no limit
+    """
+    def __init__(self, path : str, engine : str = 'objects', optimize : bool = False, cache_dir : str = None,
+                    cache_size : int = 128, trace : int = None, timeout : int = 10):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, request_handler)
+        self.engine = engine
+        self.trace = trace
+        self.timeout = timeout
+        if timeout:
+            signal.signal(signal.SIGALRM, stop_run)
+        self.optimize = optimize
+        self.cache_dir = cache_dir
+        self.programs = program_cache(cache_size)
+
+    def load(self, key : str, source : str, scopes : i_scopes.program_scopes) -> list:
+        """
+        Loads program from source text, or from the cache directory when source is None, and keeps it in memory
+
+        Returns instructions loaded to scopes, None if the program given by hash is not in the cache directory
+        """
+        if source is None:
+            data = i_cache.read_cache(os.path.join(self.cache_dir, key + '.ippc')) if self.cache_dir else None
+            i_list = i_cache.restore_program(data, scopes) if data is not None else None
+            if i_list is None:
+                return None
+            if i_list:
+                if self.optimize:
+                    i_optimizer.optimize(i_list)
+                i_instr.factory.fuse_instructions(i_list)
+        else:
+            i_list = interpret.prepare_program(io.StringIO(source), scopes, self.cache_dir, self.optimize)
+        # instructions are detached from the shared list, it is cleared for the next program
+        program = loaded_program(list(i_list), scopes)
+        self.programs.put(key, program)
+        return program.i_list
+
+    def run(self, header : dict, source : bytes, input_data : bytes) -> tuple:
+        """
+        Runs requested program, returns status, exit code, hash of program, stdout and stderr
+        """
+        engine = header.get('engine') or self.engine
+        if engine not in i_func.engines:
+            return f"unknown engine {engine}", None, None, '', ''
+        trace = header.get('trace', self.trace)
+        if trace is not None and (type(trace) != int or trace < 0):
+            return f"invalid trace size {trace}", None, None, '', ''
+        if trace and engine == 'compiled':
+            return "trace is not supported by engine compiled", None, None, '', ''
+        if source:
+            source = source.decode('utf-8', 'replace')
+            key = i_cache.cache_key(source)
+        elif header.get('hash'):
+            key = header['hash']
+            # hash is a file name in the cache directory
+            if type(key) != str or not re.fullmatch(r'[0-9a-f]{64}', key):
+                return "invalid hash", None, None, '', ''
+            source = None
+        else:
+            return "missing source or hash", None, None, '', ''
+        program = self.programs.get(key)
+        if program is None and source is None and not self.cache_dir:
+            return "unknown program", None, key, '', ''
+        unknown = False
+        def prepare(scopes):
+            nonlocal unknown
+            if program is not None:
+                return program.i_list
+            i_list = self.load(key, source, scopes)
+            unknown = i_list is None
+            return i_list
+        input_stream = io.StringIO(input_data.decode('utf-8', 'replace'))
+        try:
+            if self.timeout:
+                signal.setitimer(signal.ITIMER_REAL, self.timeout)
+            rc, stdout, stderr = interpret.run_captured(prepare, input_stream, engine, trace,
+                                                        program.scopes if program else None)
+        except run_timeout:
+            return f"time limit of {self.timeout} s exceeded", None, key, '', ''
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if unknown:
+            return "unknown program", None, key, '', ''
+        return "ok", rc, key, stdout, stderr
+
+class request_handler(socketserver.StreamRequestHandler):
+    """
+    A class to handle one request on a connection
+    """
+    def handle(self):
+        try:
+            header = json.loads(self.rfile.readline())
+            source = self.rfile.read(int(header.get('source_length', 0)))
+            input_data = self.rfile.read(int(header.get('input_length', 0)))
+        except (ValueError, TypeError, AttributeError):
+            self.respond("bad request", None, None, '', '')
+            return
+        self.respond(*self.server.run(header, source, input_data))
+
+    def respond(self, status : str, rc, key, stdout : str, stderr : str) -> None:
+        stdout = stdout.encode('utf-8', 'replace')
+        stderr = stderr.encode('utf-8', 'replace')
+        header = {'status' : status, 'exit_code' : rc, 'hash' : key,
+                    'stdout_length' : len(stdout), 'stderr_length' : len(stderr)}
+        self.wfile.write(json.dumps(header).encode() + b'\n' + stdout + stderr)
+
+def request(path : str, source : bytes = b'', input_data : bytes = b'', key : str = None, engine : str = None,
+            trace : int = None) -> dict:
+    """
+    Sends request to the server, returns response header with stdout and stderr added
+    """
+    header = {'source_length' : len(source), 'input_length' : len(input_data)}
+    if key:
+        header['hash'] = key
+    if engine:
+        header['engine'] = engine
+    if trace is not None:
+        header['trace'] = trace
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(json.dumps(header).encode() + b'\n' + source + input_data)
+        response = client.makefile('rb')
+        result = json.loads(response.readline())
+        result['stdout'] = response.read(result['stdout_length'])
+        result['stderr'] = response.read(result['stderr_length'])
+    return result
+
+def serve(path : str, engine : str = 'objects', optimize : bool = False, cache_dir : str = None,
+            cache_size : int = 128, trace : int = None, timeout : int = 10) -> None:
+    """
+    Serves requests until interrupted, the socket file is removed at the end
+    """
+    server = interpret_server(path, engine, optimize, cache_dir, cache_size, trace, timeout)
+    # SIGTERM stops the server as ctrl+c, SystemExit would be taken as exit of the running program
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,152 @@
+'''
+    File name: interpret_trace.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Trace of last executed instructions and dump of frames and data stack
+'''
+
+import sys
+
+import interpret_scopes as i_scopes
+import interpret_fuctions as i_func
+import interpret_types as i_types
+
+def format_value(value, value_type : int) -> str:
+    if value_type == i_types.UNDEFINED:
+        return '(uninitialized)'
+    return f"{i_types.type_name(value_type)}@{i_func.value_for_print(value)}"
+
+def format_var(var) -> str:
+    if var is None:
+        return '(not defined)'
+    if not var.initialized and var.buffer is not None:
+        return format_value(var.buffer.get(), var.var_type)
+    return format_value(var.value, var.var_type)
+
+def find_var(scopes : i_scopes.program_scopes, name : str):
+    """
+    Returns variable of given name or None, errors are not reported
+    """
+    frame, var_name = name[:2], name[3:]
+    if frame == 'GF':
+        gf = scopes.gf_scope
+        slot = gf.slot_names.get(var_name)
+        return gf.slots[slot] if slot is not None else None
+    if frame == 'LF':
+        return scopes.lf_scopes[-1].var_list.get(var_name) if scopes.lf_scopes else None
+    if frame == 'TF':
+        return scopes.tf_scope.var_list.get(var_name) if scopes.tf_scope else None
+    return None
+
+def format_arg(instr, arg, scopes : i_scopes.program_scopes) -> str:
+    """
+    Returns operand, variable with its current value
+    """
+    content = arg.get_value(instr)
+    if arg.get_type() == i_types.VAR:
+        return f"{content}={format_var(find_var(scopes, content))}"
+    if arg.get_type() == i_types.LABEL:
+        return content
+    return format_value(content, arg.get_type())
+
+def instr_parts(instr) -> tuple:
+    """
+    Returns instructions executed by instruction, parts of fused instruction or the instruction itself
+    """
+    return getattr(instr, 'parts', None) or (instr,)
+
+def format_instr(instr, scopes : i_scopes.program_scopes) -> list:
+    """
+    Returns lines with order, opcode and operands of instruction, fused instruction has line for every part
+    """
+    lines = []
+    for part in instr_parts(instr):
+        args = ' '.join(format_arg(part, arg, scopes) for arg in part.get_args() if arg is not None)
+        lines.append(f"o.{part.order} {part.opcode} {args}".rstrip())
+    return lines
+
+def format_scope(name : str, scope) -> list:
+    if scope is None:
+        return [f"\t{name}: (does not exist)"]
+    if isinstance(scope, i_scopes.global_scope):
+        variables = [(n, var) for n, var in zip(scope.names, scope.slots) if var is not None]
+    else:
+        variables = list(scope.var_list.items())
+    lines = [f"\t{name}: {len(variables)} variables"]
+    lines += [f"\t\t{n} = {format_var(var)}" for n, var in variables]
+    return lines
+
+def state_lines(scopes : i_scopes.program_scopes) -> list:
+    """
+    Returns lines with content of frames and of the data stack
+    """
+    lines = format_scope('GF', scopes.gf_scope)
+    lines += format_scope('LF', scopes.lf_scopes[-1] if scopes.lf_scopes else None)
+    if len(scopes.lf_scopes) > 1:
+        lines.append(f"\t\t{len(scopes.lf_scopes) - 1} more frames on the frame stack")
+    lines += format_scope('TF', scopes.tf_scope)
+    stack = scopes.stack
+    lines.append(f"\tdata stack: {len(stack)} values" + (', top first' if len(stack) else ''))
+    lines += [f"\t\t{format_value(stack.values[i], stack.types[i])}" for i in range(len(stack) - 1, -1, -1)]
+    lines.append(f"\tcall stack: {len(scopes.return_stack)} calls")
+    return lines
+
+class trace_buffer:
+    """
+    A class to keep the last executed instructions
+
+    Every step stores only index of the instruction to preallocated ring of size entries,
+    operands are formatted with current values of variables when the trace is dumped
+    """
+    # trace of the running program, dumped by error_exit
+    active = None
+
+    def __init__(self, i_list : list, scopes : i_scopes.program_scopes, size : int = 32):
+        self.i_list = i_list
+        self.scopes = scopes
+        self.size = size
+        self.nums = [None] * size
+        # position of the next record, the oldest record when the ring is full
+        self.pos = 0
+
+    def run(self, scopes : i_scopes.program_scopes, steps : list) -> None:
+        """
+        Executes steps of the program and records every executed instruction
+        """
+        nums = self.nums
+        size = self.size
+        pos = self.pos
+        end = len(steps)
+        while scopes.intr_num < end:
+            num = scopes.intr_num
+            nums[pos] = num
+            pos += 1
+            if pos == size:
+                pos = 0
+            # EXIT and errors end the program inside the step
+            self.pos = pos
+            steps[num]()
+            scopes.intr_num += 1
+
+    def records(self) -> list:
+        """
+        Returns indexes of recorded instructions, oldest first
+        """
+        nums = self.nums[self.pos:] + self.nums[:self.pos]
+        return [num for num in nums if num is not None]
+
+    def lines(self) -> list:
+        records = self.records()
+        lines = [f"\tlast {len(records)} executed instructions, oldest first, variables with current values:"]
+        for num in records:
+            lines += ['\t\t' + line for line in format_instr(self.i_list[num], self.scopes)]
+        return lines
+
+    @classmethod
+    def dump_active(cls) -> None:
+        """
+        Writes trace and state of the running program to stderr, nothing if tracing is off
+        """
+        if cls.active:
+            print('\n'.join(cls.active.lines() + state_lines(cls.active.scopes)), file=sys.stderr)
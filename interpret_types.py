@@ -0,0 +1,53 @@
+'''
+    File name: interpret_types.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Type tags of values and arguments and the nil value
+'''
+
+# type tags are bit flags, OR of tags of two operands checks both of them at once,
+# e.g. t1 | t2 == INT only if both are int, (t1 | t2) & NIL if any of them is nil
+UNDEFINED = 0
+INT = 1
+BOOL = 2
+STRING = 4
+NIL = 8
+VAR = 16
+LABEL = 32
+TYPE = 64
+
+class nil_value:
+    """
+    A class of the only nil value
+    """
+    __slots__ = ()
+    def __repr__(self):
+        return 'nil'
+
+    def __str__(self):
+        return 'nil'
+
+nil = nil_value()
+
+# names printed by TYPE and DPRINT, uninitialized variable has empty type
+type_names = {
+    UNDEFINED : '',
+    INT : 'int',
+    BOOL : 'bool',
+    STRING : 'string',
+    NIL : 'nil',
+    VAR : 'var',
+    LABEL : 'label',
+    TYPE : 'type'
+}
+type_tags = {name : tag for tag, name in type_names.items()}
+
+def type_tag(name : str) -> int:
+    """
+    Returns tag of type with given name, None for unknown type
+    """
+    return type_tags.get(name)
+
+def type_name(tag : int) -> str:
+    return type_names[tag]
@@ -87,7 +87,9 @@ function xmlEscape($string) {
 function check_instruction($programXML, $split, $i_order) {
     $instruction_list = array('MOVE', 'CREATEFRAME', 'PUSHFRAME', 'POPFRAME', 'DEFVAR', 'CALL', 'RETURN', 'PUSHS', 'POPS', 'ADD', 'SUB', 'MUL',
                         'IDIV', 'LT', 'GT', 'EQ', 'AND', 'OR', 'NOT', 'INT2CHAR', 'STRI2INT', 'READ', 'CONCAT', 'STRLEN', 'GETCHAR', 'SETCHAR',
-                        'TYPE', 'LABEL', 'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'EXIT', 'DPRINT', 'BREAK', 'WRITE');     
+                        'TYPE', 'LABEL', 'JUMP', 'JUMPIFEQ', 'JUMPIFNEQ', 'EXIT', 'DPRINT', 'BREAK', 'WRITE',
+                        'CLEARS', 'ADDS', 'SUBS', 'MULS', 'IDIVS', 'LTS', 'GTS', 'EQS', 'ANDS', 'ORS', 'NOTS', 'INT2CHARS',
+                        'STRI2INTS', 'JUMPIFEQS', 'JUMPIFNEQS');     
 
     if (in_array($split[0], $instruction_list)) {
         $instruction = add_instruction($programXML, $split[0], $i_order);
@@ -110,6 +112,20 @@ function process_instruction($instruction, $split) {
         case 'POPFRAME':
         case 'RETURN':
         case 'BREAK':
+        // STACK extension, operands are on the data stack
+        case 'CLEARS':
+        case 'ADDS':
+        case 'SUBS':
+        case 'MULS':
+        case 'IDIVS':
+        case 'LTS':
+        case 'GTS':
+        case 'EQS':
+        case 'ANDS':
+        case 'ORS':
+        case 'NOTS':
+        case 'INT2CHARS':
+        case 'STRI2INTS':
             if(count($split) != 1) {
                 wrong_num_operands(strtoupper($split[0]));
             }
@@ -146,6 +162,8 @@ function process_instruction($instruction, $split) {
         case 'CALL':
         case 'LABEL':
         case 'JUMP':
+        case 'JUMPIFEQS':
+        case 'JUMPIFNEQS':
             if(count($split) != 2) {
                 wrong_num_operands(strtoupper($split[0]));
             }
@@ -0,0 +1,281 @@
+'''
+    File name: test.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Testing program for parse.php and interpret.py running tests in parallel
+'''
+
+import argparse
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+import interpret
+import interpret_batch as i_batch
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+class xml_rules:
+    """
+    A class to represent rules of XML comparison, read from options file of JExamXML
+    """
+    def __init__(self):
+        self.case_sensitive = True
+        self.ignore_whitespaces = True
+        self.ignore_attributes = False
+        self.ignore_values = False
+        self.ignore_elements = set()
+
+    def read(self, path : str) -> None:
+        """
+        Reads comparison options, validation options and unknown options are skipped
+        """
+        with open(path, encoding='utf-8', errors='replace') as options_file:
+            for line in options_file:
+                line = line.split('#', 1)[0]
+                if '=' not in line:
+                    continue
+                option, value = (part.strip() for part in line.split('=', 1))
+                if option == 'CaseSensitive':
+                    self.case_sensitive = value == '1'
+                elif option == 'IgnoreWhitespaces':
+                    self.ignore_whitespaces = value == '1'
+                elif option == 'IgnoreAttributes':
+                    self.ignore_attributes = value == '1'
+                elif option == 'IgnoreValues':
+                    self.ignore_values = value == '1'
+                elif option == 'IgnoreElement':
+                    self.ignore_elements.add(value)
+
+    def name(self, name : str) -> str:
+        return name if self.case_sensitive else name.lower()
+
+    def value(self, value : str) -> str:
+        value = value or ''
+        if self.ignore_whitespaces:
+            value = value.strip()
+        return self.name(value)
+
+def canonical_xml(elem, rules : xml_rules, parent : str = '') -> tuple:
+    """
+    Returns element as tuple which is equal for equal elements
+
+    Order of attributes and of sibling elements is not significant, as in JExamXML
+    """
+    tag = rules.name(elem.tag)
+    path = f"{parent}>{tag}" if parent else tag
+    attributes = () if rules.ignore_attributes else tuple(sorted((rules.name(k), rules.value(v)) for k, v in elem.attrib.items()))
+    children = []
+    text = [rules.value(elem.text)]
+    for child in elem:
+        text.append(rules.value(child.tail))
+        child_tag = rules.name(child.tag)
+        if child_tag in rules.ignore_elements or f"{path}>{child_tag}" in rules.ignore_elements:
+            continue
+        children.append(canonical_xml(child, rules, path))
+    text = '' if rules.ignore_values else ''.join(text)
+    return (tag, attributes, text, tuple(sorted(children)))
+
+def compare_xml(output : bytes, reference : bytes, rules : xml_rules) -> bool:
+    """
+    Returns True if both documents are equal under the rules, invalid XML is never equal
+    """
+    try:
+        return canonical_xml(ET.fromstring(output), rules) == canonical_xml(ET.fromstring(reference), rules)
+    except ET.ParseError:
+        return False
+
+def get_tests(directory : str, recursive : bool) -> list:
+    """
+    Returns names of all tests (paths of .src files without extension) in directory
+    """
+    return i_batch.find_tests(directory, recursive)
+
+def read_file(path : str) -> bytes:
+    if not os.path.isfile(path):
+        return b''
+    with open(path, 'rb') as f:
+        return f.read()
+
+def write_file(path : str, data : bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+class test_config:
+    """
+    A class to represent settings of testing shared by all workers
+    """
+    def __init__(self, args):
+        self.mode = args.mode
+        self.parse_script = args.parse_script
+        self.int_script = args.int_script
+        self.noclean = args.noclean
+        self.php = shutil.which('php8.1') or shutil.which('php') or 'php8.1'
+        self.rules = xml_rules()
+        options = os.path.join(args.jexampath, 'options')
+        if os.path.isfile(options):
+            self.rules.read(options)
+        # the interpret of this directory runs in the worker, other scripts in a new process
+        self.in_process = os.path.abspath(args.int_script) == os.path.join(script_dir, 'interpret.py')
+
+def parse(config : test_config, name : str) -> tuple:
+    """
+    Runs parse.php on source of test, returns exit code and XML
+    """
+    with open(name + '.src', 'rb') as src_file:
+        parsed = subprocess.run([config.php, config.parse_script], stdin=src_file, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+    if config.noclean:
+        write_file(name + '.tmp', parsed.stdout)
+    return parsed.returncode, parsed.stdout
+
+def run_interpret(config : test_config, name : str, source : bytes = None) -> tuple:
+    """
+    Runs interpret on XML source (source of test if not given), returns exit code, output and stderr
+
+    Trace given in .args file of test is passed to the interpret
+    """
+    input_data = read_file(name + '.in')
+    trace = i_batch.read_trace(name)
+    if config.in_process:
+        if source is None:
+            source = read_file(name + '.src')
+        input_stream = io.StringIO(input_data.decode('utf-8', 'replace'))
+        rc, stdout, stderr = interpret.run_captured(
+            lambda scopes: interpret.prepare_program(io.StringIO(source.decode('utf-8', 'replace')), scopes),
+            input_stream, trace=trace)
+        stdout = stdout.encode('utf-8', 'replace')
+        stderr = stderr.encode('utf-8', 'replace')
+    else:
+        source_path = name + '.src'
+        if source is not None:
+            source_path = name + '.tmp'
+            write_file(source_path, source)
+        options = [f"--trace={trace}"] if trace else []
+        ran = subprocess.run([sys.executable, config.int_script, '--source=' + source_path] + options,
+                                input=input_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if source is not None and not config.noclean:
+            os.unlink(source_path)
+        rc, stdout, stderr = ran.returncode, ran.stdout, ran.stderr
+    if config.noclean:
+        write_file(name + '.tmp.out', stdout)
+    return rc, stdout, stderr
+
+def run_test(config : test_config, name : str) -> bool:
+    """
+    Runs test in mode of config, returns True if test passed
+
+    Exit code must match the .rc file, output is compared only when both exit codes are 0,
+    stderr of the interpret is compared with the .err file if the test has one
+    """
+    ref_rc = int(read_file(name + '.rc').strip() or 0)
+    if config.mode == 'int-only':
+        rc, output, stderr = run_interpret(config, name)
+    else:
+        rc, output = parse(config, name)
+        if config.mode == 'parse-only':
+            if rc != ref_rc:
+                return False
+            return rc != 0 or compare_xml(output, read_file(name + '.out'), config.rules)
+        if rc != 0:
+            return rc == ref_rc
+        rc, output, stderr = run_interpret(config, name, output)
+    if rc != ref_rc:
+        return False
+    if os.path.isfile(name + '.err') and stderr != read_file(name + '.err'):
+        return False
+    return rc != 0 or output == read_file(name + '.out')
+
+worker_config = None
+
+def init_worker(config : test_config) -> None:
+    global worker_config
+    worker_config = config
+
+def run_worker_test(name : str) -> bool:
+    return run_test(worker_config, name)
+
+def print_results(tests : list, results : list) -> None:
+    """
+    Prints results as HTML page, the same as test.php
+    """
+    passed_tests = [name for name, passed in zip(tests, results) if passed]
+    failed_tests = [name for name, passed in zip(tests, results) if not passed]
+    passed = len(passed_tests)
+    failed = len(failed_tests)
+    out = ["<!DOCTYPE html>\n<html>\n<head>\n"]
+    out.append('<style>\n        body {\n            color: white;\n        }\n        ul {\n'
+                '            padding-right: 50px;   \n        }' + "\n</style>\n")
+    out.append("<title>Test results</title>\n        </head>\n        <body style=\"background-color:#1e1e1e;\">")
+    out.append("<h1 style=\"color:white;\">Test results:</h1>\n"
+                f"        <h3 style=\"color:white;\">PASSED: {passed}</h3>\n"
+                f"        <h3 style=\"color:white;\">FAILED: {failed}</h3>\n")
+    if failed == 0 and passed != 0:
+        out.append('<h1 style="color:green;">ALL PASSED</h1>')
+    if passed:
+        out.append('<ul style="width:30%; float:left; list-style-type:none;">')
+        out.append('<h2 style="color:green;">Passed tests</h2>\n')
+        out += [f"\t<li>{name}</li>\n" for name in passed_tests]
+        out.append('</ul>\n')
+    if failed:
+        out.append('<ul style="width:30%; float:left; list-style-type:none;">')
+        out.append('<h2 style="color:red;">Failed tests</h2>\n')
+        out += [f"\t<li>{name}</li>\n" for name in failed_tests]
+        out.append('</ul>')
+    out.append("\n</body>\n</html>")
+    sys.stdout.write(''.join(out))
+
+def file_validity(path : str) -> None:
+    """
+    Exits if given file is not readable or if folder does not exist
+    """
+    if not os.path.exists(path):
+        print(f"Error: file or folder does not exit {path}", file=sys.stderr)
+        exit(11)
+    if not os.access(path, os.R_OK):
+        print(f"Error: file is not readable {path}", file=sys.stderr)
+        exit(11)
+
+def main():
+    parser = argparse.ArgumentParser(description='Testing program for parse.php and interpret.py, results are printed as HTML')
+    parser.add_argument('--directory', help='tests will be searched in given directory')
+    parser.add_argument('--recursive', action='store_true', help='tests will also be searched recursivly in given directory')
+    parser.add_argument('--parse-script', help='file with script for analysis of source code in IPPcode22')
+    parser.add_argument('--int-script', help='file with XML interpret script')
+    parser.add_argument('--parse-only', dest='mode', action='store_const', const='parse-only', default='both',
+                        help='only parser will be tested')
+    parser.add_argument('--int-only', dest='mode', action='store_const', const='int-only', help='only interpret will be tested')
+    parser.add_argument('--jexampath', help='path to directory with options of JExamXML')
+    parser.add_argument('--noclean', action='store_true', help='auxilliary files will not be deleted during testing')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    args = parser.parse_args()
+
+    # only given paths are checked, as in test.php
+    for path in (args.directory, args.parse_script, args.int_script):
+        if path is not None:
+            file_validity(path)
+    if args.jexampath is not None:
+        file_validity(os.path.join(args.jexampath, 'options'))
+    args.directory = args.directory or './'
+    args.parse_script = args.parse_script or './parse.php'
+    args.int_script = args.int_script or './interpret.py'
+    args.jexampath = args.jexampath or '/pub/courses/ipp/jexamxml/'
+    if not os.path.isdir(args.directory):
+        print("Error: Failed to open directory: No such file or directory ", file=sys.stderr)
+        exit(41)
+    config = test_config(args)
+    tests = get_tests(args.directory, args.recursive)
+    if args.jobs <= 1:
+        results = [run_test(config, name) for name in tests]
+    else:
+        with multiprocessing.Pool(args.jobs, init_worker, (config,)) as pool:
+            results = pool.map(run_worker_test, tests, chunksize=max(1, len(tests) // (args.jobs * 8)))
+    print_results(tests, results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+'''
+    File name: test_analysis.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Tests of the control flow analysis script, run by pytest
+'''
+
+import json
+import os
+import subprocess
+import sys
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+def program(*instructions) -> str:
+    """
+    Returns XML of program with given lines of IPPcode22, arguments are written as in IPPcode22
+    """
+    labels = ('LABEL', 'JUMP', 'CALL', 'JUMPIFEQ', 'JUMPIFNEQ')
+    lines = ['<program language="IPPcode22">']
+    for order, line in enumerate(instructions, 1):
+        opcode, *args = line.split()
+        lines.append(f'<instruction order="{order}" opcode="{opcode}">')
+        for n, arg in enumerate(args, 1):
+            if arg[:3] in ('GF@', 'LF@', 'TF@'):
+                arg_type, content = 'var', arg
+            elif opcode in labels and n == 1:
+                arg_type, content = 'label', arg
+            else:
+                arg_type, content = arg.split('@', 1)
+            lines.append(f'<arg{n} type="{arg_type}">{content}</arg{n}>')
+        lines.append('</instruction>')
+    lines.append('</program>')
+    return '\n'.join(lines)
+
+def analyze(tmp_path, source : str) -> dict:
+    path = tmp_path / 'program.xml'
+    path.write_text(source)
+    result = subprocess.run([sys.executable, os.path.join(repo_dir, 'interpret_analysis.py'), f'--source={path}'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout)
+
+# nested loops, call of a procedure, unreachable WRITE, POPFRAME of no frame and LF@x which is never defined
+sample_program = program(
+    'DEFVAR GF@i', 'DEFVAR GF@j', 'MOVE GF@i int@0',
+    'LABEL outer', 'MOVE GF@j int@0',
+    'LABEL inner', 'ADD GF@j GF@j int@1', 'JUMPIFNEQ inner GF@j int@3',
+    'ADD GF@i GF@i int@1', 'JUMPIFNEQ outer GF@i int@3',
+    'CREATEFRAME', 'PUSHFRAME', 'CALL proc',
+    'POPFRAME', 'POPFRAME', 'EXIT int@0',
+    'WRITE string@dead',
+    'LABEL proc', 'DEFVAR LF@y', 'MOVE LF@y int@1', 'WRITE LF@x', 'RETURN')
+
+def block_summary(block : dict) -> tuple:
+    return (block['name'], [(s['kind'], s['to']) for s in block['succs']], block['ends'], block['reachable'],
+            block['frames'], block['loop_depth'])
+
+def test_blocks(tmp_path):
+    blocks = analyze(tmp_path, sample_program)['blocks']
+    no_frame = 'LF depth 0, TF does not exist'
+    in_call = 'LF depth 1, TF does not exist'
+    assert [block_summary(b) for b in blocks] == [
+        ('o.1', [('next', 1)], False, True, [no_frame], 0),
+        ('outer', [('next', 2)], False, True, [no_frame], 1),
+        ('inner', [('jump', 2), ('next', 3)], False, True, [no_frame], 2),
+        ('o.9', [('jump', 1), ('next', 4)], False, True, [no_frame], 1),
+        ('o.11', [('call', 7)], False, True, [no_frame], 0),
+        ('o.14', [], True, True, [in_call], 0),
+        ('o.17', [('next', 7)], False, False, [], 0),
+        ('proc', [('return', 5)], False, True, [in_call], 0),
+    ]
+    assert blocks[7]['instructions'] == ['o.18 LABEL proc', 'o.19 DEFVAR LF@y', 'o.20 MOVE LF@y int@1',
+                                         'o.21 WRITE LF@x', 'o.22 RETURN']
+
+def test_procedures_and_loops(tmp_path):
+    procedures = analyze(tmp_path, sample_program)['procedures']
+    assert procedures == [
+        {'name' : 'main', 'entry' : 0, 'blocks' : [0, 1, 2, 3, 4, 5],
+         'idom' : {'0' : None, '1' : 0, '2' : 1, '3' : 2, '4' : 3, '5' : 4},
+         'loops' : [{'header' : 1, 'blocks' : [1, 2, 3], 'depth' : 1, 'parent' : None},
+                    {'header' : 2, 'blocks' : [2], 'depth' : 2, 'parent' : 1}]},
+        {'name' : 'proc', 'entry' : 7, 'blocks' : [7], 'idom' : {'7' : None}, 'loops' : []},
+    ]
+
+def test_frame_errors(tmp_path):
+    assert analyze(tmp_path, sample_program)['frame_errors'] == [
+        {'order' : 15, 'message' : 'popping non existent LF', 'always' : True},
+        {'order' : 21, 'message' : 'LF@x is never defined', 'always' : True},
+    ]
+
+def test_variable_defined_by_caller(tmp_path):
+    # TF@x becomes LF@x of the procedure, variables are matched by name whatever frame defines them
+    source = program('CREATEFRAME', 'DEFVAR TF@x', 'MOVE TF@x int@1', 'PUSHFRAME', 'CALL proc', 'EXIT int@0',
+                     'LABEL proc', 'WRITE LF@x', 'RETURN')
+    assert analyze(tmp_path, source)['frame_errors'] == []
+
+def test_frame_may_not_exist(tmp_path):
+    source = program('DEFVAR GF@b', 'READ GF@b type@bool', 'JUMPIFEQ skip GF@b bool@true', 'CREATEFRAME',
+                     'LABEL skip', 'DEFVAR TF@x', 'WRITE GF@undefined')
+    assert analyze(tmp_path, source)['frame_errors'] == [
+        {'order' : 6, 'message' : 'DEFVAR accesses frame which does not exist', 'always' : False},
+        {'order' : 7, 'message' : 'GF@undefined is never defined', 'always' : True},
+    ]
@@ -0,0 +1,102 @@
+'''
+    File name: test_batch.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Tests of the batch runner of interpret tests, run by pytest
+'''
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, repo_dir)
+
+import interpret_batch as i_batch
+
+def program(*instructions) -> str:
+    """
+    Returns XML of program with given instructions, each is opcode followed by (type, content) of arguments
+    """
+    lines = ['<program language="IPPcode22">']
+    for order, (opcode, *args) in enumerate(instructions, 1):
+        lines.append(f'<instruction order="{order}" opcode="{opcode}">')
+        lines += [f'<arg{n} type="{t}">{c}</arg{n}>' for n, (t, c) in enumerate(args, 1)]
+        lines.append('</instruction>')
+    lines.append('</program>')
+    return '\n'.join(lines)
+
+def write_test(directory, name : str, source : str, **files) -> None:
+    """
+    Writes .src and reference files given as extension=content
+    """
+    (directory / (name + '.src')).write_text(source)
+    for extension, content in files.items():
+        (directory / f"{name}.{extension}").write_text(content)
+
+@pytest.fixture
+def test_dir(tmp_path):
+    """
+    Directory with tests of different exit codes, two of them fail
+    """
+    echo = program(('DEFVAR', ('var', 'GF@x')), ('READ', ('var', 'GF@x'), ('type', 'int')), ('WRITE', ('var', 'GF@x')))
+    write_test(tmp_path, 'echo', echo, **{'in' : '42\n', 'out' : '42', 'rc' : '0'})
+    write_test(tmp_path, 'exit', program(('EXIT', ('int', '7'))), rc='7')
+    write_test(tmp_path, 'types', program(('DEFVAR', ('var', 'GF@x')), ('ADD', ('var', 'GF@x'), ('int', '1'), ('string', 'a'))),
+                rc='53')
+    # no reference files mean empty output and exit code 0
+    write_test(tmp_path, 'empty', program(('WRITE', ('string', ''))))
+    write_test(tmp_path, 'wrong_out', program(('WRITE', ('string', 'a'))), out='b', rc='0')
+    write_test(tmp_path, 'wrong_rc', program(('EXIT', ('int', '3'))), rc='4')
+    # output is compared only when the exit code is 0
+    write_test(tmp_path, 'error_out', program(('WRITE', ('string', 'a')), ('EXIT', ('int', '9'))), out='b', rc='9')
+    (tmp_path / 'sub').mkdir()
+    write_test(tmp_path / 'sub', 'nested', program(('WRITE', ('int', '1'))), out='1', rc='0')
+    return tmp_path
+
+expected = {
+    'echo' : (True, 0), 'empty' : (True, 0), 'error_out' : (True, 9), 'exit' : (True, 7),
+    'types' : (True, 53), 'wrong_out' : (False, 0), 'wrong_rc' : (False, 3),
+}
+
+def summary(results : list, test_dir) -> dict:
+    return {os.path.relpath(r['name'], str(test_dir)) : (r['passed'], r['rc']) for r in results}
+
+def test_find_tests(test_dir):
+    names = sorted(expected)
+    assert i_batch.find_tests(str(test_dir)) == [os.path.join(str(test_dir), n) for n in names]
+    nested = os.path.join(str(test_dir), 'sub', 'nested')
+    assert i_batch.find_tests(str(test_dir), recursive=True) == [os.path.join(str(test_dir), n) for n in names] + [nested]
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_mixed_return_codes(test_dir, jobs):
+    results = i_batch.run_tests(i_batch.find_tests(str(test_dir)), jobs)
+    assert summary(results, test_dir) == expected
+    echo = results[0]
+    assert (echo['stdout'], echo['ref_rc']) == ('42', 0)
+    assert 'wrong operand types' in results[list(sorted(expected)).index('types')]['stderr']
+
+def test_main_output(test_dir, tmp_path_factory):
+    json_path = tmp_path_factory.mktemp('results') / 'results.json'
+    result = subprocess.run([sys.executable, os.path.join(repo_dir, 'interpret_batch.py'), f'--directory={test_dir}',
+                            '--recursive', f'--json={json_path}'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert result.returncode == 1
+    lines = result.stdout.splitlines()
+    assert lines == [
+        f"FAIL {os.path.join(str(test_dir), 'wrong_out')}: output or stderr differs",
+        f"FAIL {os.path.join(str(test_dir), 'wrong_rc')}: rc 3 (expected 4)",
+        'passed 6 of 8, failed 2',
+    ]
+    with open(str(json_path)) as json_file:
+        assert summary(json.load(json_file), test_dir) == {**expected, os.path.join('sub', 'nested') : (True, 0)}
+
+def test_missing_directory(tmp_path):
+    result = subprocess.run([sys.executable, os.path.join(repo_dir, 'interpret_batch.py'),
+                            f"--directory={tmp_path / 'missing'}"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert result.returncode == 41
@@ -0,0 +1,125 @@
+'''
+    File name: test_cache.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Tests of the on-disk cache of loaded programs, run by pytest
+'''
+
+import io
+import marshal
+import os
+import sys
+import zlib
+
+import pytest
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, repo_dir)
+
+import interpret
+import interpret_cache as i_cache
+import interpret_fuctions as i_func
+import interpret_instructions as i_instr
+import interpret_scopes as i_scopes
+
+def program(*instructions) -> str:
+    """
+    Returns XML of program with given instructions, each is opcode followed by (type, content) of arguments
+    """
+    lines = ['<program language="IPPcode22">']
+    for order, (opcode, *args) in enumerate(instructions, 1):
+        lines.append(f'<instruction order="{order}" opcode="{opcode}">')
+        lines += [f'<arg{n} type="{t}">{c}</arg{n}>' for n, (t, c) in enumerate(args, 1)]
+        lines.append('</instruction>')
+    lines.append('</program>')
+    return '\n'.join(lines)
+
+counting_program = program(('DEFVAR', ('var', 'GF@n')), ('MOVE', ('var', 'GF@n'), ('int', '0')),
+                           ('LABEL', ('label', 'loop')), ('ADD', ('var', 'GF@n'), ('var', 'GF@n'), ('int', '1')),
+                           ('WRITE', ('var', 'GF@n')), ('JUMPIFNEQ', ('label', 'loop'), ('var', 'GF@n'), ('int', '3')))
+other_program = program(('WRITE', ('string', 'other')))
+
+def run_cached(source : str, cache_dir : str) -> tuple:
+    prepare = lambda scopes: interpret.prepare_program(io.StringIO(source), scopes, cache_dir)
+    return interpret.run_captured(prepare, io.StringIO())
+
+def cache_files(cache_dir : str) -> list:
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith('.ippc'))
+
+def cache_path(cache_dir : str, source : str) -> str:
+    return os.path.join(cache_dir, i_cache.cache_key(source) + '.ippc')
+
+@pytest.fixture
+def no_source_loading(monkeypatch):
+    """
+    Loading from source fails, so the program can only come from the cache
+    """
+    def load_program(source_file, scopes):
+        raise AssertionError('program loaded from source')
+    monkeypatch.setattr(i_instr.factory, 'load_program', load_program)
+
+def restore(data : bytes):
+    scopes = i_scopes.program_scopes(i_func.input_reader(io.StringIO()), i_func.output_buffer(io.StringIO()))
+    i_instr.instruction.instr_list.clear()
+    try:
+        return i_cache.restore_program(data, scopes)
+    finally:
+        i_instr.instruction.instr_list.clear()
+
+def with_payload(payload : tuple) -> bytes:
+    data = marshal.dumps(payload)
+    return i_cache.CACHE_MAGIC + zlib.crc32(data).to_bytes(4, 'little') + data
+
+def test_miss_writes_cache(tmp_path):
+    assert run_cached(counting_program, str(tmp_path)) == (0, '123', '')
+    assert cache_files(str(tmp_path)) == [os.path.basename(cache_path(str(tmp_path), counting_program))]
+
+def test_hit_runs_from_cache(tmp_path, request):
+    run_cached(counting_program, str(tmp_path))
+    request.getfixturevalue('no_source_loading')
+    assert run_cached(counting_program, str(tmp_path)) == (0, '123', '')
+
+def test_changed_source_misses(tmp_path):
+    run_cached(counting_program, str(tmp_path))
+    assert run_cached(other_program, str(tmp_path)) == (0, 'other', '')
+    assert len(cache_files(str(tmp_path))) == 2
+
+def test_other_version_is_invalid(tmp_path, monkeypatch):
+    run_cached(counting_program, str(tmp_path))
+    path = cache_path(str(tmp_path), counting_program)
+    with open(path, 'rb') as cache_file:
+        data = cache_file.read()
+    monkeypatch.setattr(i_cache, 'CACHE_MAGIC', b'IPPC' + bytes([i_cache.CACHE_VERSION + 1]) + i_cache.CACHE_MAGIC[5:])
+    assert restore(data) is None
+    # the key depends on the version too, so the new version writes its own file
+    assert run_cached(counting_program, str(tmp_path)) == (0, '123', '')
+    assert len(cache_files(str(tmp_path))) == 2
+
+def test_damaged_file_is_replaced(tmp_path):
+    run_cached(counting_program, str(tmp_path))
+    path = cache_path(str(tmp_path), counting_program)
+    with open(path, 'rb') as cache_file:
+        data = bytearray(cache_file.read())
+    data[-1] ^= 0xff
+    with open(path, 'wb') as cache_file:
+        cache_file.write(data)
+    assert restore(bytes(data)) is None
+    assert run_cached(counting_program, str(tmp_path)) == (0, '123', '')
+    with open(path, 'rb') as cache_file:
+        assert restore(cache_file.read()) is not None
+
+@pytest.mark.parametrize('record', [
+    (1, 'NOSUCHOP', None, 'string', 'a', None, None, None, None, None, None, None),
+    (1, 'WRITE', None, 'nosuchtype', 'a', None),
+    (1, 'WRITE', None),
+    (1, 'ADD', None, 'int', 1, None),
+    (1,),
+], ids=['opcode', 'type', 'no-arguments', 'few-arguments', 'short'])
+def test_bad_record_with_valid_checksum(tmp_path, record):
+    data = with_payload(((), (record,)))
+    assert restore(data) is None
+    path = cache_path(str(tmp_path), other_program)
+    with open(path, 'wb') as cache_file:
+        cache_file.write(data)
+    assert run_cached(other_program, str(tmp_path)) == (0, 'other', '')
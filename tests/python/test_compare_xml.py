@@ -0,0 +1,95 @@
+'''
+    File name: test_compare_xml.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Tests of the XML comparison of test.py, run by pytest
+'''
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, repo_dir)
+
+# test.py is loaded from its path, import by name would find the test package of the standard library
+spec = importlib.util.spec_from_file_location('ipp_test', os.path.join(repo_dir, 'test.py'))
+ipp_test = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ipp_test)
+
+reference = b'''<?xml version="1.0" encoding="UTF-8"?>
+<program language="IPPcode22">
+    <instruction order="1" opcode="DEFVAR">
+        <arg1 type="var">GF@x</arg1>
+    </instruction>
+    <instruction order="2" opcode="MOVE">
+        <arg1 type="var">GF@x</arg1>
+        <arg2 type="int">1</arg2>
+    </instruction>
+</program>'''
+
+# reference with instructions and arguments of MOVE in other order
+swapped = b'''<program language="IPPcode22">
+    <instruction order="2" opcode="MOVE"><arg2 type="int">1</arg2><arg1 type="var">GF@x</arg1></instruction>
+    <instruction order="1" opcode="DEFVAR"><arg1 type="var">GF@x</arg1></instruction>
+</program>'''
+
+def rules(**options):
+    """
+    Returns comparison rules with options set as attributes of xml_rules
+    """
+    result = ipp_test.xml_rules()
+    for name, value in options.items():
+        setattr(result, name, value)
+    return result
+
+def test_equal_pair():
+    # other whitespace, attribute order and XML declaration
+    output = (b'<program language="IPPcode22"><instruction opcode="DEFVAR" order="1"><arg1 type="var"> GF@x </arg1>'
+              b'</instruction><instruction opcode="MOVE" order="2"><arg1 type="var">GF@x</arg1>'
+              b'<arg2 type="int">1</arg2></instruction></program>')
+    assert ipp_test.compare_xml(output, reference, rules())
+    assert ipp_test.compare_xml(reference, reference, rules())
+
+def test_child_order_only():
+    assert ipp_test.compare_xml(swapped, reference, rules())
+
+@pytest.mark.parametrize('output', [
+    reference.replace(b'<arg2 type="int">1</arg2>', b'<arg2 type="int">2</arg2>'),
+    reference.replace(b'opcode="MOVE"', b'opcode="move"'),
+    reference.replace(b'order="2"', b'order="3"'),
+    reference.replace(b'<arg2 type="int">1</arg2>', b''),
+    reference.replace(b'language="IPPcode22"', b'language="IPPcode22" name="x"'),
+    reference.replace(b'</program>', b''),
+], ids=['value', 'case', 'attribute', 'missing-child', 'extra-attribute', 'invalid'])
+def test_mismatch(output):
+    assert not ipp_test.compare_xml(output, reference, rules())
+
+def test_canonical_form():
+    first = ipp_test.ET.fromstring(reference)
+    second = ipp_test.ET.fromstring(swapped)
+    assert ipp_test.canonical_xml(first, rules()) == ipp_test.canonical_xml(second, rules())
+    tag, attributes, text, children = ipp_test.canonical_xml(first, rules())
+    assert (tag, attributes, text, len(children)) == ('program', (('language', 'IPPcode22'),), '', 2)
+
+def test_rules_from_options(tmp_path):
+    options = tmp_path / 'options'
+    options.write_text('# comparison\nCaseSensitive=0\nIgnoreAttributes = 1\nIgnoreElement=arg2\n'
+                       'IgnoreElement=program>instruction>arg1\nIgnoreValues=0\nValidationSchema=x.xsd\n')
+    read = ipp_test.xml_rules()
+    read.read(str(options))
+    assert (read.case_sensitive, read.ignore_whitespaces, read.ignore_attributes, read.ignore_values) == (False, True, True, False)
+    assert read.ignore_elements == {'arg2', 'program>instruction>arg1'}
+    # case and attributes are ignored, arguments are ignored by name and by path
+    output = reference.replace(b'opcode="MOVE"', b'opcode="move" extra="1"').replace(b'<arg2 type="int">1</arg2>', b'')
+    output = output.replace(b'<arg1 type="var">GF@x</arg1>', b'<arg1 type="var">GF@y</arg1>')
+    assert ipp_test.compare_xml(output, reference, read)
+    assert not ipp_test.compare_xml(output, reference, rules())
+
+def test_ignore_values():
+    output = reference.replace(b'GF@x', b'GF@y')
+    assert not ipp_test.compare_xml(output, reference, rules())
+    assert ipp_test.compare_xml(output, reference, rules(ignore_values=True))
@@ -0,0 +1,109 @@
+'''
+    File name: test_server.py
+    Author: Jakub Krivanek (xkriva30), FIT
+    Date: April 2022 (academic year 2021/2022)
+    Python Version: 3.8
+    Brief: Tests of the protocol of the interpret server, run by pytest
+'''
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+repo_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, repo_dir)
+
+import interpret_cache as i_cache
+import interpret_server as i_server
+
+def program(*instructions) -> bytes:
+    """
+    Returns XML of program with given instructions, each is opcode followed by (type, content) of arguments
+    """
+    lines = ['<program language="IPPcode22">']
+    for order, (opcode, *args) in enumerate(instructions, 1):
+        lines.append(f'<instruction order="{order}" opcode="{opcode}">')
+        lines += [f'<arg{n} type="{t}">{c}</arg{n}>' for n, (t, c) in enumerate(args, 1)]
+        lines.append('</instruction>')
+    lines.append('</program>')
+    return '\n'.join(lines).encode()
+
+# prints its input line, GF@x is defined in every run so runs must not share frames
+echo_program = program(('DEFVAR', ('var', 'GF@x')), ('READ', ('var', 'GF@x'), ('type', 'string')),
+                        ('WRITE', ('var', 'GF@x')))
+infinite_program = program(('LABEL', ('label', 'l')), ('JUMP', ('label', 'l')))
+
+def write_program(text : str) -> bytes:
+    return program(('WRITE', ('string', text)))
+
+@pytest.fixture(scope='module')
+def server():
+    """
+    Starts server keeping 2 programs with time limit of 1 second, yields path of its socket
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'server.sock')
+        process = subprocess.Popen([sys.executable, os.path.join(repo_dir, 'interpret.py'), f"--server={path}",
+                                    '--server-cache=2', '--server-timeout=1'])
+        try:
+            for _ in range(100):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.05)
+            yield path
+        finally:
+            process.terminate()
+            process.wait()
+
+def test_source_then_hash(server):
+    first = i_server.request(server, echo_program, b'first\n')
+    assert first['status'] == 'ok'
+    assert first['exit_code'] == 0
+    assert first['stdout'] == b'first'
+    assert first['hash'] == i_cache.cache_key(echo_program.decode())
+    second = i_server.request(server, input_data=b'second\n', key=first['hash'])
+    assert second['status'] == 'ok'
+    assert second['stdout'] == b'second'
+
+@pytest.mark.parametrize('engine', ['objects', 'closures', 'compiled'])
+def test_engines_rerun_kept_program(server, engine):
+    key = i_server.request(server, echo_program, b'a\n', engine=engine)['hash']
+    for text in (b'b', b'c'):
+        result = i_server.request(server, input_data=text + b'\n', key=key, engine=engine)
+        assert (result['status'], result['exit_code'], result['stdout']) == ('ok', 0, text)
+
+def test_unknown_hash(server):
+    result = i_server.request(server, key='0' * 64)
+    assert result['status'] == 'unknown program'
+    assert result['exit_code'] is None
+
+@pytest.mark.parametrize('key', ['../../x', '0' * 63, 'A' * 64, '0' * 64 + '/'])
+def test_invalid_hash(server, key):
+    result = i_server.request(server, key=key)
+    assert result['status'] == 'invalid hash'
+    assert result['exit_code'] is None
+
+def test_lru_eviction(server):
+    first, second, third = (i_server.request(server, write_program(t))['hash'] for t in ('one', 'two', 'three'))
+    # only the last two programs are kept
+    assert i_server.request(server, key=first)['status'] == 'unknown program'
+    assert i_server.request(server, key=second)['stdout'] == b'two'
+    # second is now used more recently than third, third is dropped for a new program
+    i_server.request(server, write_program('four'))
+    assert i_server.request(server, key=third)['status'] == 'unknown program'
+    assert i_server.request(server, key=second)['stdout'] == b'two'
+
+def test_timeout(server):
+    result = i_server.request(server, infinite_program)
+    assert result['status'] == 'time limit of 1 s exceeded'
+    assert result['exit_code'] is None
+    # the server goes on with other requests
+    assert i_server.request(server, write_program('after'))['stdout'] == b'after'
+
+def test_error_exit(server):
+    result = i_server.request(server, program(('EXIT', ('int', '7'))))
+    assert (result['status'], result['exit_code']) == ('ok', 7)